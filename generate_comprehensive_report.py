@@ -1,31 +1,1050 @@
 import json
 import os
+import random
+import re
 import argparse
+import asyncio
+import collections
+import contextlib
 import datetime
+import functools
+import hashlib
+import sqlite3
+import threading
 import time
-from openai import OpenAI
+from statistics import NormalDist
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
+from openai.types.chat import ChatCompletion
 import concurrent.futures
 from tqdm import tqdm
+from latency_stats import exact_percentile, summarize_latencies
+from report_io import compact_response, compression_of, is_jsonl_report, open_report_file, report_path_with_compression, strip_compression_suffix
+from question_store import QuestionStore, is_question_store, sample_positions
 
-client = OpenAI()
+# Created on first use so replay runs work without an API key
+client = None
+client_lock = threading.Lock()
 
-# Define the models to use
+# Optional on-disk response cache, set up by configure_response_cache()
+response_cache = None
+
+# Optional persistent answer extraction memo, set up by configure_extraction_memo()
+extraction_memo = None
+
+# Per-model rate limiters keyed by model name, set up by configure_rate_limiter()
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+# Retries per request by default, as many as the OpenAI SDK would make on its own
+DEFAULT_MAX_RETRIES = 2
+
+# Retry, deadline and hedging settings, set up by configure_request_policy()
+request_policy = {"max_retries": DEFAULT_MAX_RETRIES, "timeout": None, "hedge": False, "hedge_percentile": 95}
+
+# Latencies observed per model in this run, used to decide when to hedge
+latency_trackers = {}
+latency_trackers_lock = threading.Lock()
+
+# Runs hedged requests for the thread engine, created by configure_request_policy()
+hedge_executor = None
+
+# Optional per-stage profiler, set up by configure_profiler()
+profiler = None
+
+# Define the models to use. Prices are in dollars per million tokens; prompt tokens served
+# from the provider's prefix cache are billed at "cached_input" (the input price if missing).
 MODELS = [
-    {"name": "o3-mini-2025-01-31", "reasoning_required": True, "default_effort": "low", "input": 1.10, "output": 4.4},
-    # {"name": "o3-mini-2025-01-31", "reasoning_required": True, "default_effort": "high", "input": 1.10, "output": 4.4},
-    # {"name": "o1-2024-12-17", "reasoning_required": True, "default_effort": "low", "input": 15, "output": 60},
-    # {"name": "o1-2024-12-17", "reasoning_required": True, "default_effort": "high", "input": 15, "output": 60},
-    # {"name": "o1-mini-2024-09-12", "reasoning_required": False, "input": 1.1, "output": 4.4},
-    # {"name": "gpt-4o-2024-11-20", "reasoning_required": False, "input": 2.5, "output": 10},
-    # {"name": "gpt-4o-mini-2024-07-18", "reasoning_required": False, "input": 0.15, "output": .60},
-    # {"name": "gpt-4-0613", "reasoning_required": False, "input": 30, "output": 60},
-    # {"name": "gpt-4-turbo-2024-04-09", "reasoning_required": False, "input": 10, "output": 30},
-    # {"name": "gpt-3.5-turbo-0125", "reasoning_required": False, "input": 0.5, "output": 1.5}
+    {"name": "o3-mini-2025-01-31", "reasoning_required": True, "default_effort": "low", "input": 1.10, "cached_input": 0.55, "output": 4.4, "concurrency": 10},
+    # {"name": "o3-mini-2025-01-31", "reasoning_required": True, "default_effort": "high", "input": 1.10, "cached_input": 0.55, "output": 4.4, "concurrency": 10},
+    # {"name": "o1-2024-12-17", "reasoning_required": True, "default_effort": "low", "input": 15, "cached_input": 7.5, "output": 60, "concurrency": 10},
+    # {"name": "o1-2024-12-17", "reasoning_required": True, "default_effort": "high", "input": 15, "cached_input": 7.5, "output": 60, "concurrency": 10},
+    # {"name": "o1-mini-2024-09-12", "reasoning_required": False, "input": 1.1, "cached_input": 0.55, "output": 4.4, "concurrency": 10},
+    # {"name": "gpt-4o-2024-11-20", "reasoning_required": False, "input": 2.5, "cached_input": 1.25, "output": 10, "concurrency": 10},
+    # {"name": "gpt-4o-mini-2024-07-18", "reasoning_required": False, "input": 0.15, "cached_input": 0.075, "output": .60, "concurrency": 10},
+    # {"name": "gpt-4-0613", "reasoning_required": False, "input": 30, "output": 60, "concurrency": 10},
+    # {"name": "gpt-4-turbo-2024-04-09", "reasoning_required": False, "input": 10, "output": 30, "concurrency": 10},
+    # {"name": "gpt-3.5-turbo-0125", "reasoning_required": False, "input": 0.5, "output": 1.5, "concurrency": 10}
 ]
 
-# Default batch size
+# Default batch size, used for models without their own "concurrency" cap
 BATCH_SIZE = 10  # Number of questions to process in parallel
 
+# Default response cache location and size cap
+DEFAULT_CACHE_DIR = os.path.join("outputs", ".response_cache")
+DEFAULT_CACHE_MAX_MB = 1024
+
+# Evaluation statuses that count as done when resuming a run
+EVALUATED_STATUSES = ("correct", "incorrect", "unanswered")
+
+# Model used to extract answer selections from free-text responses
+EXTRACTION_MODEL = "gpt-4o"
+
+# Completion tokens assumed for rate limiting when a request sets no max_tokens
+DEFAULT_COMPLETION_TOKEN_ESTIMATE = 1024
+
+# AIMD concurrency control: multiply the limit by this on rate limiting, and treat
+# fewer than this fraction of requests or tokens remaining as rate limiting
+AIMD_DECREASE_FACTOR = 0.5
+RATE_LIMIT_LOW_REMAINING = 0.05
+
+# Jittered exponential backoff between retries, in seconds
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# Hedging starts once this many latencies have been observed for a model
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_WORKERS = 512
+
+# Batch API settings: requests are billed at a discount and finish within the completion window
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_PRICE_FACTOR = 0.5
+BATCH_POLL_SECONDS = 30
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# Instructions used for --prompt-prefix without a file. They come before the question,
+# so every request starts with the same tokens and the provider's prefix cache can hit.
+DEFAULT_PROMPT_INSTRUCTIONS = """You are answering multiple-choice questions from a question bank.
+
+Each question is followed by the line "Report Content Errors" and then its options. Every option starts with a capital letter on a line of its own, followed by the option text. Some questions have more than one correct option.
+
+Read the question and every option carefully and reason about which options are correct. Then end your response with a final line of the form "Answer: B", or "Answer: A, C" when more than one option is correct. Use only the option letters on that line."""
+
+# Providers only cache prompt prefixes of at least this many tokens
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Early stopping never stops on the accuracy interval before this many questions are answered
+EARLY_STOP_MIN_QUESTIONS = 30
+
+# The accuracy interval is checked against the target every this many results, not after each one
+EARLY_STOP_LOOK_EVERY = 25
+
+# Number of JSONL report records written between fsyncs
+JSONL_FSYNC_EVERY = 10
+
+# Default location of the answer extraction memo table
+DEFAULT_EXTRACTION_MEMO = os.path.join("outputs", ".extraction_memo.sqlite")
+
+def client_options():
+    """Client options for the configured request policy"""
+    options = {}
+    if request_policy["timeout"] is not None:
+        options["timeout"] = request_policy["timeout"]
+    # Retries are handled by send_with_retries, so the SDK mustn't add its own
+    # uncounted ones
+    options["max_retries"] = 0
+    return options
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global client
+    with client_lock:
+        if client is None:
+            client = OpenAI(**client_options())
+        return client
+
+def get_batch_client():
+    """The shared client with the SDK's retries, for Batch API and file calls, which send_with_retries doesn't wrap"""
+    return get_client().with_options(max_retries=DEFAULT_MAX_RETRIES)
+
+class ResponseCacheMiss(Exception):
+    """Raised in replay mode when a request is not in the response cache"""
+
+class RequestDeadlineExceeded(Exception):
+    """Raised when an API call, including all of a streamed response, runs past --request-timeout"""
+
+# Errors worth retrying: connection failures and timeouts, missed deadlines, 429s and 5xx responses
+RETRYABLE_ERRORS = (APIConnectionError, RequestDeadlineExceeded, RateLimitError, InternalServerError)
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of chat completion responses.
+    Entries are keyed by a hash of the full request params and evicted least
+    recently used first once the cache grows past max_bytes.
+    """
+    
+    def __init__(self, directory, max_bytes, replay=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size_bytes = sum(os.path.getsize(path) for path in self._entry_paths())
+    
+    def _entry_paths(self):
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(".json"):
+                    yield os.path.join(root, file)
+    
+    def key(self, params):
+        """Hash the request params into a cache key"""
+        encoded = json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+    
+    def get(self, params):
+        """Return the cached entry for params, or None on a miss"""
+        path = self.path(self.key(params))
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self.lock:
+                self.misses += 1
+            return None
+        
+        with self.lock:
+            self.hits += 1
+        return entry
+    
+    def put(self, params, completion, duration_seconds):
+        """Store a completion, evicting old entries if the cache is over its size cap"""
+        path = self.path(self.key(params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "params": params,
+            "response": completion.model_dump(),
+            "duration_seconds": duration_seconds,
+            "cached_at": datetime.datetime.now().isoformat()
+        }
+        
+        # Write to a temporary file first so readers never see a partial entry
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        
+        with self.lock:
+            self.size_bytes += os.path.getsize(path) - previous_size
+            if self.size_bytes > self.max_bytes:
+                self._evict()
+    
+    def _evict(self):
+        # Drop the least recently used entries until the cache is back under 90% of its cap
+        entries = []
+        for entry_path in self._entry_paths():
+            try:
+                stat = os.stat(entry_path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        entries.sort()
+        
+        target = self.max_bytes * 0.9
+        self.size_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if self.size_bytes <= target:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            self.size_bytes -= size
+            self.evictions += 1
+    
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "replay": self.replay,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self.size_bytes
+        }
+
+def configure_response_cache(directory, max_mb=DEFAULT_CACHE_MAX_MB, replay=False):
+    """Send all chat completion requests through an on-disk response cache"""
+    global response_cache
+    response_cache = ResponseCache(directory, int(max_mb * 1024 * 1024), replay)
+    return response_cache
+
+class ExtractionMemo:
+    """
+    Persistent SQLite table mapping a hash of a model response to the answer(s)
+    GPT-4o extracted from it, shared across runs and models. Entries are tied to
+    the extraction prompt version, so changing the prompt or schema invalidates them.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.prompt_version = extraction_prompt_version()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_memo ("
+                "key TEXT PRIMARY KEY, prompt_version TEXT NOT NULL, "
+                "selected_answers TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+            # Entries from an older extraction prompt or schema can never be hit again
+            self.connection.execute("DELETE FROM extraction_memo WHERE prompt_version != ?", (self.prompt_version,))
+    
+    def key(self, model_response):
+        """Hash the extraction prompt version and response text into a memo key"""
+        encoded = f"{self.prompt_version}\n{model_response}".encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def get(self, model_response):
+        """Return the memoized selections for a response, or None on a miss"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT selected_answers FROM extraction_memo WHERE key = ?", (self.key(model_response),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"selected_answers": json.loads(row[0])}
+    
+    def put(self, model_response, selections):
+        """Memoize the selections extracted from a response"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO extraction_memo VALUES (?, ?, ?, ?)",
+                (self.key(model_response), self.prompt_version,
+                 json.dumps(selections["selected_answers"]), datetime.datetime.now().isoformat())
+            )
+    
+    def clear(self):
+        """Remove every memoized extraction"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM extraction_memo")
+    
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM extraction_memo").fetchone()[0]
+        return {
+            "path": self.path,
+            "prompt_version": self.prompt_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries
+        }
+
+def configure_extraction_memo(path=DEFAULT_EXTRACTION_MEMO, clear=False):
+    """Memoize GPT-4o answer extractions in a persistent table"""
+    global extraction_memo
+    extraction_memo = ExtractionMemo(path)
+    if clear:
+        extraction_memo.clear()
+    return extraction_memo
+
+def estimate_request_tokens(params):
+    """Estimate the tokens a request will use from its prompt length and max_tokens"""
+    prompt_characters = sum(len(str(message.get("content", ""))) for message in params.get("messages", []))
+    completion_tokens = params.get("max_tokens") or params.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKEN_ESTIMATE
+    # Roughly four characters per token for English text
+    return prompt_characters // 4 + completion_tokens
+
+def parse_rate_limit_header(headers, name):
+    """Read an integer x-ratelimit-* header, or None if it is missing or malformed"""
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """
+    Rate limiter for one model. Token buckets hold the requests-per-minute and
+    tokens-per-minute budgets, and the number of requests in flight is adjusted
+    AIMD-style: raised additively while calls succeed and cut multiplicatively on
+    429s or when the x-ratelimit-* headers show the quota running out. Limits
+    that are not configured are learned from those headers.
+    """
+    
+    def __init__(self, model_name, rpm=None, tpm=None, max_concurrency=BATCH_SIZE):
+        self.model_name = model_name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.lowest_concurrency = float(max_concurrency)
+        self.request_budget = float(rpm) if rpm else None
+        self.token_budget = float(tpm) if tpm else None
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.last_refill = time.monotonic()
+        self.first_request = None
+        self.requests = 0
+        self.tokens = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0
+    
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        if self.rpm:
+            self.request_budget = min(self.rpm, self.request_budget + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_budget = min(self.tpm, self.token_budget + elapsed * self.tpm / 60)
+    
+    def try_acquire(self, estimated_tokens):
+        """Reserve a slot and budget for a request; returns 0 on success or the seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.in_flight >= max(1, int(self.concurrency)):
+                return 0.05
+            if self.rpm and self.request_budget < 1:
+                return (1 - self.request_budget) * 60 / self.rpm
+            if self.tpm and self.token_budget < min(estimated_tokens, self.tpm):
+                return (min(estimated_tokens, self.tpm) - self.token_budget) * 60 / self.tpm
+            
+            if self.rpm:
+                self.request_budget -= 1
+            if self.tpm:
+                self.token_budget -= estimated_tokens
+            self.in_flight += 1
+            if self.first_request is None:
+                self.first_request = now
+            return 0
+    
+    def acquire(self, estimated_tokens):
+        """Block until the request may be sent; returns the time spent waiting"""
+        waited = 0
+        while (delay := self.try_acquire(estimated_tokens)) > 0:
+            time.sleep(delay)
+            waited += delay
+        with self.lock:
+            self.wait_seconds += waited
+        return waited
+    
+    async def acquire_async(self, estimated_tokens):
+        """Coroutine version of acquire"""
+        waited = 0
+        while (delay := self.try_acquire(estimated_tokens)) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        with self.lock:
+            self.wait_seconds += waited
+        return waited
+    
+    def release(self, estimated_tokens, outcome, headers=None, used_tokens=None):
+        """
+        Return a request's slot and adjust the limits from its outcome and headers.
+        Outcomes are "success", "rate_limited", "error" and "cancelled"; only the
+        first two change the concurrency limit.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if used_tokens is not None:
+                self.tokens += used_tokens
+                # Settle the token budget with what the request actually used
+                if self.tpm:
+                    self.token_budget += estimated_tokens - used_tokens
+            
+            quota_low = self._observe_headers(headers) if headers is not None else False
+            if outcome == "rate_limited" or quota_low:
+                if outcome == "rate_limited":
+                    self.rate_limited += 1
+                self.concurrency = max(1.0, self.concurrency * AIMD_DECREASE_FACTOR)
+                self.lowest_concurrency = min(self.lowest_concurrency, self.concurrency)
+            elif outcome == "success":
+                # Adds one slot per round of successful requests
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+    
+    def _observe_headers(self, headers):
+        # Learn the quota from the server, keep the budgets in line with what it reports
+        # and tell the caller whether the remaining quota is running out
+        quota_low = False
+        for limit_name, remaining_name, attribute, budget in (
+            ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "rpm", "request_budget"),
+            ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "tpm", "token_budget"),
+        ):
+            limit = parse_rate_limit_header(headers, limit_name)
+            remaining = parse_rate_limit_header(headers, remaining_name)
+            if limit is None or remaining is None:
+                continue
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, limit)
+                setattr(self, budget, float(remaining))
+            else:
+                setattr(self, budget, min(getattr(self, budget), float(remaining)))
+            if limit > 0 and remaining / limit < RATE_LIMIT_LOW_REMAINING:
+                quota_low = True
+        return quota_low
+    
+    def stats(self):
+        with self.lock:
+            elapsed_minutes = (time.monotonic() - self.first_request) / 60 if self.first_request else 0
+            return {
+                "model": self.model_name,
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "max_concurrency": self.max_concurrency,
+                "concurrency_limit": self.concurrency,
+                "lowest_concurrency_limit": self.lowest_concurrency,
+                "requests": self.requests,
+                "tokens": self.tokens,
+                "rate_limited_responses": self.rate_limited,
+                "total_wait_seconds": self.wait_seconds,
+                "effective_requests_per_minute": self.requests / elapsed_minutes if elapsed_minutes > 0 else None,
+                "effective_tokens_per_minute": self.tokens / elapsed_minutes if elapsed_minutes > 0 else None
+            }
+
+def configure_rate_limiter(model_name, rpm=None, tpm=None, max_concurrency=BATCH_SIZE):
+    """Return the rate limiter for a model, creating it on first use"""
+    with rate_limiters_lock:
+        if model_name not in rate_limiters:
+            rate_limiters[model_name] = RateLimiter(model_name, rpm, tpm, max_concurrency)
+        return rate_limiters[model_name]
+
+def extraction_rate_limit_stats(limiter, totals, makespan):
+    """
+    Rate limiting of one run's GPT-4o extraction calls. The extraction limiter is
+    shared by every model run in the process, so the counts come from the run's own
+    calls and only the limits are the shared limiter's.
+    """
+    shared = limiter.stats()
+    minutes = makespan / 60
+    return {
+        "model": shared["model"],
+        "shared_limiter": True,
+        "rpm_limit": shared["rpm_limit"],
+        "tpm_limit": shared["tpm_limit"],
+        "max_concurrency": shared["max_concurrency"],
+        "concurrency_limit": shared["concurrency_limit"],
+        "lowest_concurrency_limit": shared["lowest_concurrency_limit"],
+        "requests": totals["extraction_requests"],
+        "tokens": totals["extraction_tokens"],
+        "rate_limited_responses": totals["extraction_rate_limited"],
+        "total_wait_seconds": totals["extraction_wait_seconds"],
+        "effective_requests_per_minute": totals["extraction_requests"] / minutes if minutes > 0 else None,
+        "effective_tokens_per_minute": totals["extraction_tokens"] / minutes if minutes > 0 else None
+    }
+
+class StreamAssembler:
+    """Rebuilds a chat completion from streamed chunks, timing the output as it arrives"""
+    
+    def __init__(self, request_start):
+        self.request_start = request_start
+        self.content_times = []
+        self.content = []
+        self.first_chunk = None
+        self.finish_reason = None
+        self.usage = None
+    
+    def add(self, chunk):
+        now = time.perf_counter()
+        if self.first_chunk is None:
+            self.first_chunk = chunk
+        # With include_usage, the last chunk has the usage and no choices
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+            if choice.delta.content:
+                self.content.append(choice.delta.content)
+                self.content_times.append(now)
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+    
+    def completion(self):
+        """The chat completion the same request would have returned without streaming"""
+        return ChatCompletion.model_validate({
+            "id": self.first_chunk.id,
+            "object": "chat.completion",
+            "created": self.first_chunk.created,
+            "model": self.first_chunk.model,
+            "system_fingerprint": self.first_chunk.system_fingerprint,
+            "choices": [{
+                "index": 0,
+                "finish_reason": self.finish_reason or "stop",
+                "message": {"role": "assistant", "content": "".join(self.content)}
+            }],
+            "usage": self.usage.model_dump() if self.usage is not None else None
+        })
+    
+    def timing(self):
+        """
+        Time to first token, inter-token latency and output tokens per second.
+        Chunks can carry several tokens, so inter-token latency is measured between
+        content chunks. Reasoning tokens are generated before the first content chunk,
+        so they count towards time to first token rather than the output rate.
+        """
+        if not self.content_times:
+            return {"streamed": True, "time_to_first_token_seconds": None}
+        
+        gaps = [later - earlier for earlier, later in zip(self.content_times, self.content_times[1:])]
+        generation_seconds = self.content_times[-1] - self.content_times[0]
+        output_tokens = len(self.content_times)
+        if self.usage is not None:
+            details = self.usage.completion_tokens_details
+            reasoning_tokens = (details.reasoning_tokens or 0) if details is not None else 0
+            output_tokens = self.usage.completion_tokens - reasoning_tokens
+        
+        return {
+            "streamed": True,
+            "time_to_first_token_seconds": self.content_times[0] - self.request_start,
+            "mean_inter_token_seconds": sum(gaps) / len(gaps) if gaps else None,
+            "max_inter_token_seconds": max(gaps) if gaps else None,
+            "output_tokens_per_second": output_tokens / generation_seconds if generation_seconds > 0 else None,
+            "stream_chunks": len(self.content_times)
+        }
+
+def collect_completion(result, call_info, request_start):
+    """
+    Return the completion for a request, reassembling it first if the response was
+    streamed. The client's timeout only bounds each read, so a stream that keeps
+    sending chunks is cut off here once the call passes --request-timeout.
+    """
+    if isinstance(result, ChatCompletion):
+        return result
+    timeout = request_policy["timeout"]
+    assembler = StreamAssembler(request_start)
+    for chunk in result:
+        assembler.add(chunk)
+        if timeout is not None and time.perf_counter() - request_start > timeout:
+            result.close()
+            raise RequestDeadlineExceeded(f"Streamed response ran past the {timeout}s request deadline")
+    call_info.update(assembler.timing())
+    return assembler.completion()
+
+async def async_collect_completion(result, call_info, request_start):
+    """Coroutine version of collect_completion for async streams"""
+    if isinstance(result, ChatCompletion):
+        return result
+    assembler = StreamAssembler(request_start)
+    try:
+        async for chunk in result:
+            assembler.add(chunk)
+    except BaseException:
+        # Cut off by the request deadline or a cancelled hedge: close the connection
+        await result.close()
+        raise
+    call_info.update(assembler.timing())
+    return assembler.completion()
+
+async def with_request_deadline(awaitable):
+    """Await a whole API call within --request-timeout, rather than only bounding each read"""
+    timeout = request_policy["timeout"]
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise RequestDeadlineExceeded(f"API call ran past the {timeout}s request deadline")
+
+async def async_request_completion(params, call_info, async_client):
+    """Send a request and collect its completion, returning the raw response for its headers too"""
+    request_start = time.perf_counter()
+    raw_response = await async_client.chat.completions.with_raw_response.create(**params)
+    return raw_response, await async_collect_completion(raw_response.parse(), call_info, request_start)
+
+def send_chat_completion(params, call_info):
+    """Send one chat completion request, through the model's rate limiter when one is configured"""
+    limiter = rate_limiters.get(params["model"])
+    if limiter is None:
+        request_start = time.perf_counter()
+        return collect_completion(get_client().chat.completions.create(**params), call_info, request_start)
+    
+    estimated_tokens = estimate_request_tokens(params)
+    call_info["rate_limit_wait_seconds"] = limiter.acquire(estimated_tokens)
+    try:
+        request_start = time.perf_counter()
+        raw_response = get_client().chat.completions.with_raw_response.create(**params)
+        completion = collect_completion(raw_response.parse(), call_info, request_start)
+    except RateLimitError as e:
+        limiter.release(estimated_tokens, "rate_limited", e.response.headers)
+        raise
+    except Exception:
+        limiter.release(estimated_tokens, "error")
+        raise
+    
+    used_tokens = completion.usage.total_tokens if completion.usage else None
+    limiter.release(estimated_tokens, "success", raw_response.headers, used_tokens)
+    return completion
+
+async def async_send_chat_completion(params, call_info, async_client):
+    """Coroutine version of send_chat_completion using an AsyncOpenAI client"""
+    limiter = rate_limiters.get(params["model"])
+    if limiter is None:
+        _, completion = await with_request_deadline(async_request_completion(params, call_info, async_client))
+        return completion
+    
+    estimated_tokens = estimate_request_tokens(params)
+    call_info["rate_limit_wait_seconds"] = await limiter.acquire_async(estimated_tokens)
+    try:
+        raw_response, completion = await with_request_deadline(async_request_completion(params, call_info, async_client))
+    except RateLimitError as e:
+        limiter.release(estimated_tokens, "rate_limited", e.response.headers)
+        raise
+    except asyncio.CancelledError:
+        # A losing hedge is cancelled mid-request; CancelledError isn't an Exception,
+        # so without this its slot would never be returned
+        limiter.release(estimated_tokens, "cancelled")
+        raise
+    except Exception:
+        limiter.release(estimated_tokens, "error")
+        raise
+    
+    used_tokens = completion.usage.total_tokens if completion.usage else None
+    limiter.release(estimated_tokens, "success", raw_response.headers, used_tokens)
+    return completion
+
+class Profiler:
+    """
+    Records perf_counter_ns spans for each pipeline stage and question, on the thread
+    (or asyncio task) that ran them. Queue waits are recorded as their own stages,
+    named queue_wait:<function>, so waiting for a worker is kept apart from service time.
+    """
+    
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.spans = []
+        self.lock = threading.Lock()
+    
+    def record(self, stage, start_ns, end_ns, question_id=None):
+        span = {"stage": stage, "start_ns": start_ns, "end_ns": end_ns, "lane": current_lane(), "question_id": question_id}
+        with self.lock:
+            self.spans.append(span)
+    
+    @contextlib.contextmanager
+    def span(self, stage, question_id=None):
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(stage, start_ns, time.perf_counter_ns(), question_id)
+    
+    def summary(self):
+        """Per-stage count, total, mean and percentiles in milliseconds"""
+        with self.lock:
+            spans = list(self.spans)
+        durations = collections.defaultdict(list)
+        for span in spans:
+            durations[span["stage"]].append((span["end_ns"] - span["start_ns"]) / 1e6)
+        
+        stages = {}
+        for stage, values in durations.items():
+            ordered = sorted(values)
+            stages[stage] = {
+                "count": len(ordered),
+                "total_ms": sum(ordered),
+                "mean_ms": sum(ordered) / len(ordered),
+                "p50_ms": exact_percentile(ordered, 50),
+                "p95_ms": exact_percentile(ordered, 95),
+                "max_ms": ordered[-1]
+            }
+        return {
+            "elapsed_ms": (time.perf_counter_ns() - self.start_ns) / 1e6,
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["total_ms"]))
+        }
+    
+    def write_chrome_trace(self, trace_file):
+        """Write the spans as Chrome trace events, viewable in chrome://tracing or Perfetto"""
+        with self.lock:
+            spans = list(self.spans)
+        lanes = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault(span["lane"], len(lanes) + 1)
+            events.append({
+                "name": span["stage"],
+                "cat": "queue" if span["stage"].startswith("queue_wait:") else "stage",
+                "ph": "X",
+                "ts": (span["start_ns"] - self.start_ns) / 1000,
+                "dur": (span["end_ns"] - span["start_ns"]) / 1000,
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"question_id": span["question_id"]}
+            })
+        for lane, tid in lanes.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": lane}})
+        
+        trace_dir = os.path.dirname(trace_file)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return trace_file
+
+def current_lane():
+    """Name of the asyncio task or thread running the caller, used as the trace lane"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task.get_name() if task is not None else threading.current_thread().name
+
+def configure_profiler():
+    """Start recording per-stage spans for every question"""
+    global profiler
+    profiler = Profiler()
+    return profiler
+
+def profile_span(stage, question_id=None):
+    """Context manager timing a stage when profiling, and doing nothing otherwise"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(stage, question_id)
+
+def item_question_id(item):
+    """Question id of a pipeline item: a question, or a result holding one"""
+    if isinstance(item, dict):
+        return item.get("id", item.get("question_data", {}).get("id"))
+    return None
+
+def queued(fn):
+    """
+    Wrap fn, about to be submitted to an executor, so the profiler records how long
+    the call waits for a worker. Returns fn itself when not profiling.
+    """
+    if profiler is None:
+        return fn
+    submitted_ns = time.perf_counter_ns()
+    name = getattr(fn, "func", fn).__name__
+    
+    def run(item, *args, **kwargs):
+        profiler.record(f"queue_wait:{name}", submitted_ns, time.perf_counter_ns(), item_question_id(item))
+        return fn(item, *args, **kwargs)
+    return run
+
+def queued_async(fn):
+    """
+    Coroutine counterpart of queued: wrap coroutine fn, about to be scheduled as a
+    task, so the profiler records how long the task waits for the event loop to start
+    it. Returns fn itself when not profiling.
+    """
+    if profiler is None:
+        return fn
+    submitted_ns = time.perf_counter_ns()
+    name = getattr(fn, "func", fn).__name__
+    
+    async def run(item, *args, **kwargs):
+        profiler.record(f"queue_wait:{name}", submitted_ns, time.perf_counter_ns(), item_question_id(item))
+        return await fn(item, *args, **kwargs)
+    return run
+
+class LatencyTracker:
+    """Keeps recent successful request latencies for a model to estimate percentiles"""
+    
+    def __init__(self, max_samples=1000):
+        self.samples = collections.deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+    
+    def percentile(self, percentile):
+        """Return the latency percentile, or None until enough samples are in"""
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+def get_latency_tracker(model_name):
+    """Return the latency tracker for a model, creating it on first use"""
+    with latency_trackers_lock:
+        if model_name not in latency_trackers:
+            latency_trackers[model_name] = LatencyTracker()
+        return latency_trackers[model_name]
+
+def configure_request_policy(max_retries=DEFAULT_MAX_RETRIES, timeout=None, hedge=False, hedge_percentile=95):
+    """Set the retry, per-call deadline and hedging behaviour for all requests"""
+    global client, hedge_executor
+    request_policy.update({
+        "max_retries": max_retries,
+        "timeout": timeout,
+        "hedge": hedge,
+        "hedge_percentile": hedge_percentile
+    })
+    with client_lock:
+        # Recreate the client with the new options on next use
+        client = None
+    if hedge and hedge_executor is None:
+        hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS)
+    return request_policy
+
+def retry_delay(attempt, error):
+    """Seconds to wait before the next attempt: Retry-After if given, else jittered exponential backoff"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def send_timed(params, call_info):
+    """Send a request and record its latency for the hedging threshold"""
+    start_time = time.perf_counter()
+    completion = send_chat_completion(params, call_info)
+    get_latency_tracker(params["model"]).record(time.perf_counter() - start_time)
+    return completion
+
+def send_hedged(params, call_info):
+    """
+    Send a request and, if it is still running after the hedging percentile of the
+    latencies seen so far, send a duplicate and use whichever succeeds first.
+    """
+    threshold = get_latency_tracker(params["model"]).percentile(request_policy["hedge_percentile"]) if request_policy["hedge"] else None
+    if threshold is None:
+        return send_timed(params, call_info)
+    
+    primary_info = {}
+    attempts = {hedge_executor.submit(send_timed, params, primary_info): primary_info}
+    done, _ = concurrent.futures.wait(attempts, timeout=threshold)
+    if not done:
+        call_info["hedged"] = True
+        hedge_info = {}
+        attempts[hedge_executor.submit(send_timed, params, hedge_info)] = hedge_info
+    
+    pending = set(attempts)
+    error = None
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                call_info.update(attempts[future])
+                call_info["hedge_won"] = attempts[future] is not primary_info
+                # The losing request can't be cancelled once sent; its result is ignored
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+def send_with_retries(params, call_info):
+    """Send a request, retrying retryable errors with jittered exponential backoff"""
+    attempt = 0
+    while True:
+        try:
+            completion = send_hedged(params, call_info)
+            call_info["retries"] = attempt
+            return completion
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, RateLimitError):
+                call_info["rate_limited"] = call_info.get("rate_limited", 0) + 1
+            if attempt >= request_policy["max_retries"]:
+                call_info["retries"] = attempt
+                raise
+            time.sleep(retry_delay(attempt, e))
+            attempt += 1
+
+async def async_send_timed(params, call_info, async_client):
+    """Coroutine version of send_timed"""
+    start_time = time.perf_counter()
+    completion = await async_send_chat_completion(params, call_info, async_client)
+    get_latency_tracker(params["model"]).record(time.perf_counter() - start_time)
+    return completion
+
+async def async_send_hedged(params, call_info, async_client):
+    """Coroutine version of send_hedged; the losing request is cancelled"""
+    threshold = get_latency_tracker(params["model"]).percentile(request_policy["hedge_percentile"]) if request_policy["hedge"] else None
+    if threshold is None:
+        return await async_send_timed(params, call_info, async_client)
+    
+    primary_info = {}
+    attempts = {asyncio.ensure_future(async_send_timed(params, primary_info, async_client)): primary_info}
+    pending = set(attempts)
+    error = None
+    # Pending attempts are cancelled however this returns, including when the caller is cancelled while waiting
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=threshold)
+        if not done:
+            call_info["hedged"] = True
+            hedge_info = {}
+            attempts[asyncio.ensure_future(async_send_timed(params, hedge_info, async_client))] = hedge_info
+            pending = set(attempts)
+        
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    call_info.update(attempts[task])
+                    call_info["hedge_won"] = attempts[task] is not primary_info
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def async_send_with_retries(params, call_info, async_client):
+    """Coroutine version of send_with_retries"""
+    attempt = 0
+    while True:
+        try:
+            completion = await async_send_hedged(params, call_info, async_client)
+            call_info["retries"] = attempt
+            return completion
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, RateLimitError):
+                call_info["rate_limited"] = call_info.get("rate_limited", 0) + 1
+            if attempt >= request_policy["max_retries"]:
+                call_info["retries"] = attempt
+                raise
+            await asyncio.sleep(retry_delay(attempt, e))
+            attempt += 1
+
+def create_chat_completion(params):
+    """
+    Create a chat completion, going through the response cache when one is configured.
+    Returns the completion and a dict describing the call.
+    """
+    if response_cache is not None:
+        entry = response_cache.get(params)
+        if entry is not None:
+            call_info = {"cache_hit": True, "cached_duration_seconds": entry.get("duration_seconds")}
+            return ChatCompletion.model_validate(entry["response"]), call_info
+        if response_cache.replay:
+            raise ResponseCacheMiss(f"No cached response for {params['model']} request {response_cache.key(params)[:12]}")
+    
+    start_time = time.time()
+    call_info = {"retries": 0, "hedged": False}
+    try:
+        completion = send_with_retries(params, call_info)
+    except Exception as e:
+        # Keep the retry and hedge counts for the report's error entry
+        e.call_info = call_info
+        raise
+    
+    if response_cache is not None:
+        response_cache.put(params, completion, time.time() - start_time)
+        call_info["cache_hit"] = False
+    return completion, call_info
+
+async def async_create_chat_completion(params, async_client):
+    """Coroutine version of create_chat_completion using an AsyncOpenAI client"""
+    if response_cache is not None:
+        entry = response_cache.get(params)
+        if entry is not None:
+            call_info = {"cache_hit": True, "cached_duration_seconds": entry.get("duration_seconds")}
+            return ChatCompletion.model_validate(entry["response"]), call_info
+        if response_cache.replay:
+            raise ResponseCacheMiss(f"No cached response for {params['model']} request {response_cache.key(params)[:12]}")
+    
+    start_time = time.time()
+    call_info = {"retries": 0, "hedged": False}
+    try:
+        completion = await async_send_with_retries(params, call_info, async_client)
+    except Exception as e:
+        # Keep the retry and hedge counts for the report's error entry
+        e.call_info = call_info
+        raise
+    
+    if response_cache is not None:
+        response_cache.put(params, completion, time.time() - start_time)
+        call_info["cache_hit"] = False
+    return completion, call_info
+
 def load_qa_data(file_path):
     """Load the qa_data.json file"""
     try:
@@ -56,36 +1075,60 @@ def load_qa_data(file_path):
         print("Please check that the file exists and is accessible.")
         exit(1)
 
-def extract_questions_from_qa_data(qa_data, test_id=None):
-    """Extract questions from qa_data.json"""
-    questions = []
-    
+def prepare_question(q, test_id):
+    """Format a question from qa_data.json for sending, keeping what is needed to evaluate the answer"""
+    with profile_span("format_question", q.get("id", "")):
+        question_text = format_question_with_options(q)
+    return {
+        "text": question_text,
+        "id": q.get("id", ""),
+        "test_id": test_id,
+        "correct_answer": q.get("correct_answer", []),
+        "options": q.get("options", {})
+    }
+
+def extract_questions_from_qa_data(qa_data, test_id=None, sample=None, sample_seed=0, sample_strategy="stratified"):
+    """
+    Extract questions from qa_data.json. With sample, only a seeded sample of that
+    many questions is extracted, stratified across tests or uniformly at random.
+    """
     # If test_id is specified, only extract questions from that test
     if test_id:
-        if test_id in qa_data:
-            for q in qa_data[test_id]:
-                question_text = format_question_with_options(q)
-                questions.append({
-                    "text": question_text,
-                    "id": q.get("id", ""),
-                    "correct_answer": q.get("correct_answer", []),
-                    "options": q.get("options", {})
-                })
-        else:
+        if test_id not in qa_data:
             print(f"Warning: Test ID '{test_id}' not found in qa_data.json")
+            return []
+        test_ids = [test_id]
     else:
-        # Extract questions from all tests
-        for test_id, test_questions in qa_data.items():
-            for q in test_questions:
-                question_text = format_question_with_options(q)
-                questions.append({
-                    "text": question_text,
-                    "id": q.get("id", ""),
-                    "correct_answer": q.get("correct_answer", []),
-                    "options": q.get("options", {})
-                })
-    
-    return questions
+        test_ids = list(qa_data)
+    
+    if sample:
+        positions = sample_positions([len(qa_data[test]) for test in test_ids], sample, sample_seed, sample_strategy)
+        return [prepare_question(qa_data[test_ids[stratum]][position], test_ids[stratum]) for stratum, position in positions]
+    return [prepare_question(q, test) for test in test_ids for q in qa_data[test]]
+
+def load_questions(qa_data_file, test_id=None, sample=None, sample_seed=0, sample_strategy="stratified"):
+    """
+    Load the questions to run from qa_data.json, or from a question store written by
+    process_qa_to_json.py. A store is read lazily: only the questions of the test
+    or sample are read and formatted, not the whole bank.
+    """
+    if not is_question_store(qa_data_file):
+        return extract_questions_from_qa_data(load_qa_data(qa_data_file), test_id, sample, sample_seed, sample_strategy)
+    
+    try:
+        store = QuestionStore(qa_data_file)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error loading question store: {e}")
+        exit(1)
+    try:
+        if test_id and not store.test_counts(test_id):
+            print(f"Warning: Test ID '{test_id}' not found in {qa_data_file}")
+            return []
+        if sample:
+            return [prepare_question(q, test) for test, q in store.sample(sample, sample_seed, sample_strategy, test_id)]
+        return [prepare_question(q, test) for test, q in store.iter_questions(test_id)]
+    finally:
+        store.close()
 
 def format_question_with_options(question_data):
     """Format a question with its options for sending to the model"""
@@ -105,8 +1148,8 @@ def normalize_answer(answer):
         return [a.upper() for a in answer]
     return answer.upper()
 
-def send_questions_to_openai(question, model_info):
-    """Send questions to OpenAI"""
+def build_question_params(question, model_info):
+    """Build the chat completion parameters for a question"""
     model_name = model_info["name"]
     
     # Base parameters for the API call
@@ -118,6 +1161,10 @@ def send_questions_to_openai(question, model_info):
         ]
     }
     
+    # A fixed prefix goes first, in its own message, so requests share it byte for byte
+    if model_info.get("prompt_prefix"):
+        params["messages"].insert(0, {"role": "user", "content": model_info["prompt_prefix"]})
+    
     # Add reasoning_effort parameter if the model requires it
     if model_info.get("reasoning_required", False):
         reasoning_effort = model_info.get("reasoning_effort", model_info.get("default_effort", "medium"))
@@ -127,86 +1174,401 @@ def send_questions_to_openai(question, model_info):
         if model_name != "o1-mini-2024-09-12":
             params["temperature"] = 0.0
     
-    completion = client.chat.completions.create(**params)
-    return completion
+    # Stream the answer to time its first token and output rate; the last chunk carries the usage
+    if model_info.get("stream", False):
+        params["stream"] = True
+        params["stream_options"] = {"include_usage": True}
+    
+    return params
+
+def send_questions_to_openai(question, model_info):
+    """Send questions to OpenAI, returning the completion and a dict describing the call"""
+    params = build_question_params(question, model_info)
+    return create_chat_completion(params)
+
+async def async_send_questions_to_openai(question, model_info, async_client):
+    """Send questions to OpenAI with an AsyncOpenAI client"""
+    params = build_question_params(question, model_info)
+    return await async_create_chat_completion(params, async_client)
+
+def build_timing_info(start_time, end_time):
+    """Create the timing info dictionary for a request"""
+    return {
+        "start_time": datetime.datetime.fromtimestamp(start_time).isoformat(),
+        "end_time": datetime.datetime.fromtimestamp(end_time).isoformat(),
+        "duration_seconds": end_time - start_time
+    }
+
+def process_question(question_data, model_info):
+    """Process a single question and return the result"""
+    # Record start time
+    start_time = time.time()
+    
+    # Send request to OpenAI
+    try:
+        with profile_span("api_call", question_data["id"]):
+            response, call_info = send_questions_to_openai(question_data["text"], model_info)
+    except Exception as e:
+        # Keep the timing of failed requests for the report's error entry
+        e.timing_info = {**build_timing_info(start_time, time.time()), **getattr(e, "call_info", {})}
+        raise
+    
+    return {
+        "question_data": question_data,
+        "response": response,
+        "timing_info": {**build_timing_info(start_time, time.time()), **call_info}
+    }
+
+async def async_process_question(question_data, model_info, async_client):
+    """Process a single question as a coroutine and return the result"""
+    start_time = time.time()
+    try:
+        with profile_span("api_call", question_data["id"]):
+            response, call_info = await async_send_questions_to_openai(question_data["text"], model_info, async_client)
+    except Exception as e:
+        e.timing_info = {**build_timing_info(start_time, time.time()), **getattr(e, "call_info", {})}
+        raise
+    
+    return {
+        "question_data": question_data,
+        "response": response,
+        "timing_info": {**build_timing_info(start_time, time.time()), **call_info}
+    }
+
+def iter_sliding_window(executor, fn, items, max_in_flight, *args, then=None):
+    """
+    Run fn(item, *args) on the executor with at most max_in_flight calls running.
+    A new item is submitted as soon as any call finishes, and (item, future) pairs
+    are yielded in completion order.
+    
+    If then=(executor, fn) is given, each successful result is handed to that second
+    stage as fn(result, *args) and the yielded future is the second-stage one. The
+    freed slot is refilled straight away, so both stages overlap.
+    """
+    items = iter(items)
+    in_flight = {}
+    in_second_stage = {}
+    
+    def submit_next():
+        for item in items:
+            in_flight[executor.submit(queued(fn), item, *args)] = item
+            return
+    
+    # Fill every slot before waiting on anything
+    for _ in range(max_in_flight):
+        submit_next()
+    
+    while in_flight or in_second_stage:
+        pending = list(in_flight) + list(in_second_stage)
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future in in_second_stage:
+                yield in_second_stage.pop(future), future
+                continue
+            
+            item = in_flight.pop(future)
+            # Refill the freed slot before handing the result on
+            submit_next()
+            
+            if then is None or future.exception() is not None:
+                yield item, future
+            else:
+                second_executor, second_fn = then
+                in_second_stage[second_executor.submit(queued(second_fn), future.result(), *args)] = item
+
+async def iter_sliding_window_async(fn, items, max_in_flight, *args, then=None):
+    """
+    Asyncio counterpart of iter_sliding_window: run coroutine fn(item, *args) with at
+    most max_in_flight running and yield (item, task) pairs in completion order.
+    
+    If then=(semaphore, fn) is given, each successful result is passed to the second
+    stage coroutine fn(result, *args), which runs under the semaphore.
+    """
+    items = iter(items)
+    in_flight = {}
+    in_second_stage = {}
+    
+    def submit_next():
+        for item in items:
+            in_flight[asyncio.ensure_future(queued_async(fn)(item, *args))] = item
+            return
+    
+    async def run_second_stage(semaphore, second_fn, result):
+        # Time spent waiting for the semaphore is this stage's queue wait
+        waiting_since = time.perf_counter_ns()
+        async with semaphore:
+            if profiler is not None:
+                name = getattr(second_fn, "func", second_fn).__name__
+                profiler.record(f"queue_wait:{name}", waiting_since, time.perf_counter_ns(), item_question_id(result))
+            return await second_fn(result, *args)
+    
+    # Fill every slot before waiting on anything
+    for _ in range(max_in_flight):
+        submit_next()
+    
+    while in_flight or in_second_stage:
+        pending = set(in_flight) | set(in_second_stage)
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task in in_second_stage:
+                yield in_second_stage.pop(task), task
+                continue
+            
+            item = in_flight.pop(task)
+            # Refill the freed slot before handing the result on
+            submit_next()
+            
+            if then is None or task.exception() is not None:
+                yield item, task
+            else:
+                semaphore, second_fn = then
+                in_second_stage[asyncio.ensure_future(run_second_stage(semaphore, second_fn, task.result()))] = item
+
+def build_extraction_params(model_response):
+    """Build the GPT-4o structured-output parameters for answer extraction"""
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are an assistant that analyzes multiple choice question responses. Extract only the letter(s) of the selected answer(s) from the provided response."
+            },
+            {
+                "role": "user",
+                "content": f"Extract the selected answer letter(s) (A, B, C, D, E, F, G, H, or I) from this response to a multiple choice question: \n\n{model_response}"
+            }
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "multiple_choice_response",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "selected_answers": {
+                            "type": "array",
+                            "description": "An array of selected letter answers from the provided response to a multiple choice question.",
+                            "items": {
+                                "type": "string",
+                                "enum": ["A", "B", "C", "D", "E", "F", "G", "H", "I"]
+                            }
+                        }
+                    },
+                    "required": ["selected_answers"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "temperature": 0,
+        "max_tokens": 100,
+        "top_p": 1,
+        "frequency_penalty": 0,
+        "presence_penalty": 0
+    }
+
+def extraction_prompt_version():
+    """Hash the extraction prompt and schema so memoized extractions can be invalidated"""
+    encoded = json.dumps(build_extraction_params("{model_response}"), sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+def extraction_call_record(call_info, completion=None):
+    """What a GPT-4o extraction call used, kept in the report entry so each run can account for its own calls"""
+    if call_info.get("cache_hit"):
+        return {"requests": 0}
+    return {
+        "requests": 1 + call_info.get("retries", 0),
+        "rate_limited": call_info.get("rate_limited", 0),
+        "rate_limit_wait_seconds": call_info.get("rate_limit_wait_seconds", 0),
+        "tokens": completion.usage.total_tokens if completion is not None and completion.usage else 0
+    }
+
+def extract_answer_selections(model_response):
+    """
+    Send the model's response to GPT-4o to extract the selected answer(s).
+    """
+    if extraction_memo is not None:
+        memoized = extraction_memo.get(model_response)
+        if memoized is not None:
+            return {**memoized, "memo_hit": True}
+    
+    try:
+        response, call_info = create_chat_completion(build_extraction_params(model_response))
+        selections = json.loads(response.choices[0].message.content)
+    except ResponseCacheMiss:
+        raise
+    except Exception as e:
+        print(f"Error extracting answer selections: {e}")
+        return {"selected_answers": [], "call": extraction_call_record(getattr(e, "call_info", {}))}
+    
+    if extraction_memo is not None:
+        extraction_memo.put(model_response, selections)
+    return {**selections, "call": extraction_call_record(call_info, response)}
+
+async def async_extract_answer_selections(model_response, async_client):
+    """
+    Send the model's response to GPT-4o with an AsyncOpenAI client to extract the selected answer(s).
+    """
+    if extraction_memo is not None:
+        memoized = extraction_memo.get(model_response)
+        if memoized is not None:
+            return {**memoized, "memo_hit": True}
+    
+    try:
+        response, call_info = await async_create_chat_completion(build_extraction_params(model_response), async_client)
+        selections = json.loads(response.choices[0].message.content)
+    except ResponseCacheMiss:
+        raise
+    except Exception as e:
+        print(f"Error extracting answer selections: {e}")
+        return {"selected_answers": [], "call": extraction_call_record(getattr(e, "call_info", {}))}
+    
+    if extraction_memo is not None:
+        extraction_memo.put(model_response, selections)
+    return {**selections, "call": extraction_call_record(call_info, response)}
+
+# Answers extracted locally at or above this confidence skip the GPT-4o fallback
+LOCAL_EXTRACTION_MIN_CONFIDENCE = 0.8
+
+# Letters the GPT-4o extractor can return, used when a question has no options
+DEFAULT_OPTION_LETTERS = ["A", "B", "C", "D", "E", "F", "G", "H", "I"]
+
+# Phrases that introduce a final answer, e.g. "Answer: B" or "The correct options are A and C"
+ANSWER_CUE_PATTERN = re.compile(
+    r"\b(?:final\s+answer|correct\s+answer|correct\s+option|correct\s+choice|answer\s+choice|answer)(?:s|\(s\))?\b"
+    r"(?:[^\S\n]*(?:is|are|would\s+be|should\s+be|will\s+be))?[^\S\n]*[:=\-–—]?",
+    re.IGNORECASE
+)
+LEADING_LETTER_PATTERN = re.compile(r"[\s*_`\"'\[]*\(?([A-Z])\)?(?![A-Za-z0-9'])")
+LETTER_SEPARATOR_PATTERN = re.compile(r"[\s*_`]*(?:,[\s*_`]*(?:and\b)?|&|/|\band\b)[\s*_`]*")
+BARE_LETTERS_PATTERN = re.compile(r"[\s*_`\"'(\[]*[A-Z][)\]]?(?:[\s*_`]*(?:,|&|/|\band\b|,\s*and\b)[\s*_`(]*[A-Z]\)?)*[\s*_`\"'.)\]]*")
+BOLD_LETTER_PATTERN = re.compile(r"\*\*[^\S\n]*\(?([A-Z])\)?(?:[.:)]|[^\S\n]*\*\*)")
+
+def parse_answer_letters(text, options):
+    """
+    Parse a leading list of option letters such as "B", "(A) and (C)" or "**A, D**".
+    Returns the letters in order, or an empty list if the text does not start with
+    a clear letter list (for example "A large number of ...").
+    """
+    letters = []
+    pos = 0
+    tail_start = 0
+    while True:
+        match = LEADING_LETTER_PATTERN.match(text, pos)
+        if not match:
+            break
+        letters.append(match.group(1))
+        tail_start = match.end()
+        separator = LETTER_SEPARATOR_PATTERN.match(text, tail_start)
+        if not separator or separator.end() == tail_start:
+            break
+        pos = separator.end()
+    
+    valid_letters = list(options) or DEFAULT_OPTION_LETTERS
+    if not letters or any(letter not in valid_letters for letter in letters):
+        return []
+    
+    # A bare letter must be followed by punctuation, the end of the line or its option text
+    last = text[:tail_start].rstrip()
+    tail = text[tail_start:].lstrip(" *_`\"']").strip()
+    if last.endswith(")") or not tail or tail[0] in ".:;,)-–—(!?":
+        return list(dict.fromkeys(letters))
+    option_text = str(options.get(letters[-1], "")).strip().lower()
+    if option_text and tail.lower().startswith(option_text[:30]):
+        return list(dict.fromkeys(letters))
+    return []
 
-def process_question(question_data, model_info):
-    """Process a single question and return the result"""
-    # Record start time
-    start_time = time.time()
-    start_time_str = datetime.datetime.fromtimestamp(start_time).isoformat()
+def normalize_option_text(text):
+    """Normalize option or response text for loose comparison"""
+    text = re.sub(r"[*_`\"'\s]+", " ", str(text)).strip().lower()
+    return text.rstrip(".!")
+
+def extract_answer_locally(model_response, options):
+    """
+    Extract the selected answer(s) from the response text without an API call.
+    Returns a dict with selected_answers, a confidence between 0 and 1 and the
+    pattern that matched.
+    """
+    text = (model_response or "").strip()
+    options = options or {}
+    no_match = {"selected_answers": [], "confidence": 0.0, "pattern": None}
+    if not text:
+        return no_match
     
-    # Send request to OpenAI
-    response = send_questions_to_openai(question_data["text"], model_info)
+    # The whole response is just the letter(s), e.g. "B" or "A, C"
+    valid_letters = list(options) or DEFAULT_OPTION_LETTERS
+    if BARE_LETTERS_PATTERN.fullmatch(text):
+        letters = list(dict.fromkeys(re.findall(r"[A-Z]", text)))
+        if all(letter in valid_letters for letter in letters):
+            return {"selected_answers": letters, "confidence": 0.99, "pattern": "bare_letters"}
     
-    # Record end time and calculate duration
-    end_time = time.time()
-    end_time_str = datetime.datetime.fromtimestamp(end_time).isoformat()
-    duration = end_time - start_time
+    # Final-answer lines; the last one wins, but disagreement lowers confidence
+    candidates = []
+    for cue in ANSWER_CUE_PATTERN.finditer(text):
+        line_end = text.find("\n", cue.end())
+        letters = parse_answer_letters(text[cue.end():line_end if line_end != -1 else len(text)], options)
+        if letters:
+            candidates.append(letters)
+    if candidates:
+        agreeing = all(sorted(c) == sorted(candidates[-1]) for c in candidates)
+        return {"selected_answers": candidates[-1], "confidence": 0.95 if agreeing else 0.6, "pattern": "final_answer_line"}
     
-    # Create timing info dictionary
-    timing_info = {
-        "start_time": start_time_str,
-        "end_time": end_time_str,
-        "duration_seconds": duration
-    }
+    # A single bolded letter, e.g. "**B**" or "**B) Paris**"
+    bolded = list(dict.fromkeys(m.group(1) for m in BOLD_LETTER_PATTERN.finditer(text) if m.group(1) in valid_letters))
+    if len(bolded) == 1:
+        return {"selected_answers": bolded, "confidence": 0.85, "pattern": "bold_letter"}
+    if bolded:
+        return {"selected_answers": bolded, "confidence": 0.4, "pattern": "bold_letter"}
     
-    return {
-        "question_data": question_data,
-        "response": response,
-        "timing_info": timing_info
+    # The response, or its last line, repeats exactly one option's text
+    last_line = text.splitlines()[-1]
+    for candidate_text, confidence in ((text, 0.9), (last_line, 0.85)):
+        normalized = normalize_option_text(candidate_text)
+        matches = [key for key, value in options.items() if normalize_option_text(value) == normalized]
+        if len(matches) == 1:
+            return {"selected_answers": matches, "confidence": confidence, "pattern": "option_text"}
+    
+    return no_match
+
+def build_extraction_record(selected_answers, method, local, start_time, call=None):
+    """Describe how the selected answer(s) were extracted, and the GPT-4o call made for them if any"""
+    record = {
+        "selected_answers": selected_answers,
+        "method": method,
+        "pattern": local["pattern"] if local else None,
+        "confidence": local["confidence"] if local else None,
+        "duration_seconds": time.perf_counter() - start_time
     }
+    if call is not None:
+        record["call"] = call
+    return record
 
-def extract_answer_selections(model_response):
+def resolve_answer_selections(model_response, options, extraction="auto"):
     """
-    Send the model's response to GPT-4o to extract the selected answer(s).
+    Extract the selected answer(s), trying the local extractor first and falling
+    back to the GPT-4o call when it is not confident.
     """
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an assistant that analyzes multiple choice question responses. Extract only the letter(s) of the selected answer(s) from the provided response."
-                },
-                {
-                    "role": "user",
-                    "content": f"Extract the selected answer letter(s) (A, B, C, D, E, F, G, H, or I) from this response to a multiple choice question: \n\n{model_response}"
-                }
-            ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "multiple_choice_response",
-                    "strict": True,
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "selected_answers": {
-                                "type": "array",
-                                "description": "An array of selected letter answers from the provided response to a multiple choice question.",
-                                "items": {
-                                    "type": "string",
-                                    "enum": ["A", "B", "C", "D", "E", "F", "G", "H", "I"]
-                                }
-                            }
-                        },
-                        "required": ["selected_answers"],
-                        "additionalProperties": False
-                    }
-                }
-            },
-            temperature=0,
-            max_tokens=100,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0
-        )
-        
-        return json.loads(response.choices[0].message.content)
-    except Exception as e:
-        print(f"Error extracting answer selections: {e}")
-        return {"selected_answers": []}
+    start_time = time.perf_counter()
+    local = extract_answer_locally(model_response, options) if extraction == "auto" else None
+    
+    if local and local["confidence"] >= LOCAL_EXTRACTION_MIN_CONFIDENCE:
+        return build_extraction_record(local["selected_answers"], "local", local, start_time)
+    
+    selections = extract_answer_selections(model_response)
+    return build_extraction_record(selections["selected_answers"], "memo" if selections.get("memo_hit") else "llm", local, start_time,
+                                   selections.get("call"))
+
+async def async_resolve_answer_selections(model_response, options, async_client, extraction="auto"):
+    """Coroutine version of resolve_answer_selections"""
+    start_time = time.perf_counter()
+    local = extract_answer_locally(model_response, options) if extraction == "auto" else None
+    
+    if local and local["confidence"] >= LOCAL_EXTRACTION_MIN_CONFIDENCE:
+        return build_extraction_record(local["selected_answers"], "local", local, start_time)
+    
+    selections = await async_extract_answer_selections(model_response, async_client)
+    return build_extraction_record(selections["selected_answers"], "memo" if selections.get("memo_hit") else "llm", local, start_time,
+                                   selections.get("call"))
 
 def calculate_costs(response_data, model_info):
     """Calculate costs for a single response based on token usage"""
@@ -250,8 +1612,16 @@ def calculate_costs(response_data, model_info):
         elif hasattr(usage, "completion_tokens_details"):
             reasoning_tokens = getattr(usage.completion_tokens_details, "reasoning_tokens", 0)
         
+        # Handle prompt tokens served from the provider's prefix cache
+        cached_tokens = 0
+        if isinstance(usage, dict):
+            cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        elif getattr(usage, "prompt_tokens_details", None) is not None:
+            cached_tokens = getattr(usage.prompt_tokens_details, "cached_tokens", 0) or 0
+        cached_input_price = model_info.get("cached_input", model_info["input"])
+        
         # Calculate costs (convert from dollars per million tokens to dollars)
-        prompt_cost = (prompt_tokens * model_info["input"]) / 1000000
+        prompt_cost = ((prompt_tokens - cached_tokens) * model_info["input"] + cached_tokens * cached_input_price) / 1000000
         completion_cost = (completion_tokens * model_info["output"]) / 1000000
         reasoning_cost = (reasoning_tokens * model_info["output"]) / 1000000
         total_cost = prompt_cost + completion_cost
@@ -261,7 +1631,10 @@ def calculate_costs(response_data, model_info):
             "prompt_cost": prompt_cost,
             "completion_cost": completion_cost,
             "reasoning_cost": reasoning_cost,
-            "total_cost": total_cost
+            "total_cost": total_cost,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_savings": cached_tokens * (model_info["input"] - cached_input_price) / 1000000
         }
         
         return costs
@@ -275,7 +1648,10 @@ def calculate_costs(response_data, model_info):
             "prompt_cost": 0,
             "completion_cost": 0,
             "reasoning_cost": 0,
-            "total_cost": 0
+            "total_cost": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "cache_savings": 0
         }
 
 def evaluate_answer(response, llm_selections):
@@ -307,19 +1683,736 @@ def evaluate_answer(response, llm_selections):
         evaluation["message"] = f"Incorrect answer. Selected: {', '.join(llm_selections)}. Correct answer: {', '.join(correct_answers_list)}"
         return evaluation, "incorrect"
 
-def generate_comprehensive_report(model_info, qa_data_file, output_file, test_id=None, batch_size=BATCH_SIZE):
+def build_response_entry(result, selections, model_info):
+    """Cost and evaluate an answered question whose selections have been extracted"""
+    question_id = result["question_data"]["id"]
+    
+    # Convert the response to a dictionary for JSON serialization
+    with profile_span("model_dump", question_id):
+        response_dict = result["response"].model_dump()
+    
+    # Calculate costs
+    with profile_span("calculate_costs", question_id):
+        costs = calculate_costs({"response": response_dict}, model_info)
+    
+    # Create the response object
+    response = {
+        "id": result["question_data"]["id"],
+        "question": result["question_data"]["text"],
+        "response": response_dict,
+        "timing": result["timing_info"],
+        "costs": costs,
+        "answer_selections": selections["selected_answers"],
+        "answer_extraction": {key: value for key, value in selections.items() if key != "selected_answers"}
+    }
+    
+    # Evaluate the answer
+    with profile_span("evaluate_answer", question_id):
+        evaluation, status = evaluate_answer(result, selections["selected_answers"])
+    response["evaluation"] = evaluation
+    
+    return response, status
+
+def build_error_entry(question_data, error):
+    """Describe a question whose request failed so it stays in the report"""
+    return {
+        "id": question_data["id"],
+        "question": question_data["text"],
+        "response": None,
+        "timing": getattr(error, "timing_info", None) or {"duration_seconds": 0},
+        "costs": {
+            "prompt_cost": 0,
+            "completion_cost": 0,
+            "reasoning_cost": 0,
+            "total_cost": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "cache_savings": 0
+        },
+        "answer_selections": [],
+        "evaluation": {
+            "correct_answer": question_data.get("correct_answer", []),
+            "options": question_data.get("options", {}),
+            "status": "error",
+            "message": f"Request failed: {type(error).__name__}: {error}"
+        }
+    }
+
+def finalize_result(result, model_info, extraction="auto"):
+    """Extract, cost and evaluate a single answered question"""
+    content = result["response"].choices[0].message.content
+    with profile_span("extraction", result["question_data"]["id"]):
+        selections = resolve_answer_selections(content, result["question_data"].get("options", {}), extraction)
+    return build_response_entry(result, selections, model_info)
+
+async def async_finalize_result(result, model_info, async_client, extraction="auto"):
+    """Coroutine version of finalize_result"""
+    content = result["response"].choices[0].message.content
+    with profile_span("extraction", result["question_data"]["id"]):
+        selections = await async_resolve_answer_selections(content, result["question_data"].get("options", {}), async_client, extraction)
+    return build_response_entry(result, selections, model_info)
+
+def new_run_totals():
+    """Create the counters accumulated while a report is generated"""
+    return {
+        "duration_seconds": 0,
+        "prompt_cost": 0,
+        "completion_cost": 0,
+        "reasoning_cost": 0,
+        "total_cost": 0,
+        "correct": 0,
+        "incorrect": 0,
+        "unanswered": 0,
+        "error": 0,
+        "retries": 0,
+        "hedged": 0,
+        "hedge_wins": 0,
+        "latencies": [],
+        "first_token_latencies": [],
+        "streamed": 0,
+        "time_to_first_token_seconds": 0,
+        "max_time_to_first_token_seconds": 0,
+        "inter_token_seconds": 0,
+        "inter_token_samples": 0,
+        "output_tokens_per_second": 0,
+        "output_rate_samples": 0,
+        "local_extractions": 0,
+        "llm_extractions": 0,
+        "local_extraction_seconds": 0,
+        "llm_extraction_seconds": 0,
+        "extraction_requests": 0,
+        "extraction_rate_limited": 0,
+        "extraction_wait_seconds": 0,
+        "extraction_tokens": 0,
+        "memo_extractions": 0,
+        "memo_extraction_seconds": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "cache_savings": 0,
+        "prompt_cache_hits": 0,
+        "priced_responses": 0
+    }
+
+def record_response(writer, totals, response, status):
+    """Write an evaluated response to the report and update the run totals"""
+    costs = response["costs"]
+    totals["duration_seconds"] += response["timing"]["duration_seconds"]
+    totals["prompt_cost"] += costs["prompt_cost"]
+    totals["completion_cost"] += costs["completion_cost"]
+    totals["reasoning_cost"] += costs["reasoning_cost"]
+    totals["total_cost"] += costs["total_cost"]
+    
+    # Reports from before cached-token pricing have no token counts in their costs
+    if costs.get("prompt_tokens"):
+        totals["priced_responses"] += 1
+        totals["prompt_tokens"] += costs["prompt_tokens"]
+        totals["cached_tokens"] += costs.get("cached_tokens", 0)
+        totals["cache_savings"] += costs.get("cache_savings", 0)
+        totals["prompt_cache_hits"] += 1 if costs.get("cached_tokens") else 0
+    
+    if status in ("correct", "incorrect", "unanswered", "error"):
+        totals[status] += 1
+    
+    timing = response["timing"]
+    totals["retries"] += timing.get("retries", 0)
+    totals["hedged"] += 1 if timing.get("hedged") else 0
+    totals["hedge_wins"] += 1 if timing.get("hedge_won") else 0
+    
+    # Latency percentiles cover API calls only: cache hits, batch results and errors have no request latency
+    if status != "error" and not timing.get("cache_hit") and "batch_id" not in timing:
+        totals["latencies"].append(timing["duration_seconds"])
+    
+    if timing.get("time_to_first_token_seconds") is not None:
+        totals["first_token_latencies"].append(timing["time_to_first_token_seconds"])
+        totals["streamed"] += 1
+        totals["time_to_first_token_seconds"] += timing["time_to_first_token_seconds"]
+        totals["max_time_to_first_token_seconds"] = max(totals["max_time_to_first_token_seconds"], timing["time_to_first_token_seconds"])
+        if timing.get("mean_inter_token_seconds") is not None:
+            totals["inter_token_seconds"] += timing["mean_inter_token_seconds"]
+            totals["inter_token_samples"] += 1
+        if timing.get("output_tokens_per_second") is not None:
+            totals["output_tokens_per_second"] += timing["output_tokens_per_second"]
+            totals["output_rate_samples"] += 1
+    
+    # Reports from before local extraction have no answer_extraction block
+    method = response.get("answer_extraction", {}).get("method")
+    if method is not None:
+        totals[f"{method}_extractions"] += 1
+        totals[f"{method}_extraction_seconds"] += response["answer_extraction"]["duration_seconds"]
+    
+    # GPT-4o extraction calls made for this run, whatever other runs share the extraction limiter
+    call = response.get("answer_extraction", {}).get("call")
+    if call is not None:
+        totals["extraction_requests"] += call["requests"]
+        totals["extraction_rate_limited"] += call.get("rate_limited", 0)
+        totals["extraction_wait_seconds"] += call.get("rate_limit_wait_seconds", 0)
+        totals["extraction_tokens"] += call.get("tokens", 0)
+    
+    if "cache_hit" in response["timing"]:
+        totals["cache_hits" if response["timing"]["cache_hit"] else "cache_misses"] += 1
+    
+    with profile_span("write_response", response["id"]):
+        writer.write_response(response)
+
+def wilson_interval(successes, n, confidence):
+    """Wilson score confidence interval for a proportion, as (lower, upper)"""
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z / (1 + z * z / n) * (p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+class EarlyStopping:
+    """
+    Sequential testing: no more questions are handed out once the accuracy interval
+    is narrower than target_ci_width or the run has cost max_cost. Questions already
+    in flight still finish.
+    
+    The interval is checked at fixed looks, after min_questions results and then
+    every look_every results. Every look, plus the final interval, is a chance of a
+    miss, so each uses a Bonferroni-adjusted confidence level over the most looks
+    the run can take. The reported interval then keeps its confidence level however
+    many times it was checked.
+    """
+    
+    def __init__(self, target_ci_width=None, max_cost=None, confidence=0.95, min_questions=EARLY_STOP_MIN_QUESTIONS,
+                 look_every=EARLY_STOP_LOOK_EVERY, available_questions=None):
+        self.target_ci_width = target_ci_width
+        self.max_cost = max_cost
+        self.confidence = confidence
+        self.min_questions = min_questions
+        self.look_every = max(1, look_every)
+        self.max_looks = 1
+        if target_ci_width is not None:
+            # The looks the run can take, plus the final interval
+            remaining = max(0, (available_questions or min_questions) - min_questions)
+            self.max_looks = 2 + remaining // self.look_every
+        self.adjusted_confidence = 1 - (1 - confidence) / self.max_looks
+        self.next_look = min_questions
+        self.looks = 0
+        self.answered = 0
+        self.correct = 0
+        self.interval = (0.0, 1.0)
+        self.reason = None
+        self.stopped_after = None
+    
+    def update(self, totals):
+        """Recompute the interval from the run totals and decide whether to stop"""
+        self.answered = totals["correct"] + totals["incorrect"] + totals["unanswered"] + totals["error"]
+        self.correct = totals["correct"]
+        self.interval = wilson_interval(self.correct, self.answered, self.adjusted_confidence)
+        if self.reason is not None:
+            return
+        
+        # The cost budget is not a statistical test, so it is checked after every result
+        if self.max_cost is not None and totals["total_cost"] >= self.max_cost:
+            self.reason = "cost_budget"
+        elif self.target_ci_width is not None and self.answered >= self.next_look:
+            self.looks += 1
+            while self.next_look <= self.answered:
+                self.next_look += self.look_every
+            if self.interval[1] - self.interval[0] <= self.target_ci_width:
+                self.reason = "ci_width"
+        
+        if self.reason is not None:
+            self.stopped_after = self.answered
+            lower, upper = self.interval
+            print(f"\nStopping early ({self.reason}) after {self.answered} questions: "
+                  f"accuracy {self.confidence:.0%} CI (adjusted for {self.max_looks} looks) [{lower:.2%}, {upper:.2%}], "
+                  f"${totals['total_cost']:.6f} spent")
+    
+    def schedule(self, questions):
+        """Yield questions until the stopping rule is met"""
+        for question in questions:
+            if self.reason is not None:
+                return
+            yield question
+    
+    def summary(self, available_questions):
+        lower, upper = self.interval
+        return {
+            "target_ci_width": self.target_ci_width,
+            "max_cost": self.max_cost,
+            "confidence": self.confidence,
+            "min_questions": self.min_questions,
+            "look_every": self.look_every,
+            "looks": self.looks,
+            "max_looks": self.max_looks,
+            "interval": "wilson, bonferroni-adjusted for max_looks",
+            "adjusted_confidence": self.adjusted_confidence,
+            "nominal_accuracy_ci": list(wilson_interval(self.correct, self.answered, self.confidence)),
+            "stopped_early": self.reason is not None,
+            "reason": self.reason,
+            "stopped_after_questions": self.stopped_after,
+            "answered_questions": self.answered,
+            "available_questions": available_questions,
+            "accuracy_ci": [lower, upper],
+            "ci_width": upper - lower
+        }
+
+def stratified_question_order(questions, seed=0):
+    """Shuffle questions so that every prefix covers each test in proportion to its size"""
+    tests = {}
+    for question in questions:
+        tests.setdefault(question.get("test_id"), []).append(question)
+    groups = list(tests.values())
+    order = sample_positions([len(group) for group in groups], len(questions), seed, "stratified")
+    return [groups[stratum][position] for stratum, position in order]
+
+def apply_run_totals(results, totals, total_questions):
+    """Write the run totals into the report metadata and evaluation summary"""
+    # Update metadata with totals
+    results["metadata"]["total_duration_seconds"] = totals["duration_seconds"]
+    results["metadata"]["costs"] = {
+        "total_prompt_cost": totals["prompt_cost"],
+        "total_completion_cost": totals["completion_cost"],
+        "total_reasoning_cost": totals["reasoning_cost"],
+        "total_cost": totals["total_cost"],
+        "total_cache_savings": totals["cache_savings"]
+    }
+    
+    # Prompt tokens served from the provider's prefix cache, and how often requests hit it
+    results["metadata"]["prompt_cache"] = {
+        "prompt_tokens": totals["prompt_tokens"],
+        "cached_tokens": totals["cached_tokens"],
+        "cached_token_rate": totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] > 0 else 0,
+        "responses": totals["priced_responses"],
+        "responses_with_cached_tokens": totals["prompt_cache_hits"],
+        "hit_rate": totals["prompt_cache_hits"] / totals["priced_responses"] if totals["priced_responses"] > 0 else 0,
+        "savings": totals["cache_savings"]
+    }
+    
+    # Estimate the time saved by local and memoized extraction from the LLM calls seen in this run
+    local_extractions = totals["local_extractions"]
+    memo_extractions = totals["memo_extractions"]
+    llm_extractions = totals["llm_extractions"]
+    extracted = local_extractions + memo_extractions + llm_extractions
+    mean_llm_extraction = totals["llm_extraction_seconds"] / llm_extractions if llm_extractions > 0 else None
+    results["metadata"]["answer_extraction"] = {
+        "local_extractions": local_extractions,
+        "llm_extractions": llm_extractions,
+        "local_hit_rate": local_extractions / extracted if extracted > 0 else 0,
+        "mean_llm_extraction_seconds": mean_llm_extraction,
+        "estimated_latency_saved_seconds": (
+            (local_extractions + memo_extractions) * mean_llm_extraction
+            - totals["local_extraction_seconds"] - totals["memo_extraction_seconds"]
+            if mean_llm_extraction is not None else None
+        )
+    }
+    
+    if extraction_memo is not None:
+        fallbacks = memo_extractions + llm_extractions
+        results["metadata"]["answer_extraction"]["memo"] = {
+            **extraction_memo.stats(),
+            "run_hits": memo_extractions,
+            "run_misses": llm_extractions,
+            "run_hit_rate": memo_extractions / fallbacks if fallbacks > 0 else 0
+        }
+    
+    results["metadata"]["latency"] = summarize_latencies(totals["latencies"])
+    
+    if totals["streamed"] > 0:
+        results["metadata"]["streaming"] = {
+            "streamed_responses": totals["streamed"],
+            "mean_time_to_first_token_seconds": totals["time_to_first_token_seconds"] / totals["streamed"],
+            "max_time_to_first_token_seconds": totals["max_time_to_first_token_seconds"],
+            "mean_inter_token_seconds": totals["inter_token_seconds"] / totals["inter_token_samples"] if totals["inter_token_samples"] > 0 else None,
+            "mean_output_tokens_per_second": totals["output_tokens_per_second"] / totals["output_rate_samples"] if totals["output_rate_samples"] > 0 else None,
+            "time_to_first_token": summarize_latencies(totals["first_token_latencies"])
+        }
+    
+    results["metadata"]["request_policy"] = {
+        **request_policy,
+        "total_retries": totals["retries"],
+        "hedged_requests": totals["hedged"],
+        "hedge_wins": totals["hedge_wins"],
+        "errored_questions": totals["error"]
+    }
+    
+    if response_cache is not None:
+        results["metadata"]["response_cache"] = {
+            **response_cache.stats(),
+            "question_hits": totals["cache_hits"],
+            "question_misses": totals["cache_misses"]
+        }
+    
+    # Add evaluation summary to metadata
+    accuracy = totals["correct"] / total_questions if total_questions > 0 else 0
+    results["metadata"]["total_correct"] = totals["correct"]
+    results["metadata"]["total_incorrect"] = totals["incorrect"]
+    results["metadata"]["accuracy"] = accuracy
+    
+    # Add full evaluation summary
+    results["evaluation_summary"] = {
+        "total_questions": total_questions,
+        "correct_answers": totals["correct"],
+        "incorrect_answers": totals["incorrect"],
+        "unanswered_questions": totals["unanswered"],
+        "errored_questions": totals["error"],
+        "accuracy": accuracy
+    }
+
+class JsonReportWriter:
+    """
+    Keep responses in memory and write the report as a single JSON file at the end.
+    With compact, entries are stored in the compact schema (see compact_response).
+    """
+    
+    def __init__(self, output_file, results, compact=False):
+        self.output_file = output_file
+        self.results = results
+        self.compact = compact
+    
+    def write_response(self, response):
+        self.results["responses"].append(compact_response(response) if self.compact else response)
+    
+    def close(self):
+        with open_report_file(self.output_file, 'w') as f:
+            # Compact reports skip the indentation too
+            json.dump(self.results, f, indent=None if self.compact else 4)
+
+class JsonlReportWriter:
+    """
+    Append one JSON line per evaluated response as it completes. The file starts
+    with a header line holding the initial metadata and ends with a trailer line
+    holding the final metadata and evaluation summary, so a crashed run keeps
+    every response written so far.
+    """
+    
+    def __init__(self, output_file, results, fsync_every=JSONL_FSYNC_EVERY, compact=False):
+        self.output_file = output_file
+        self.results = results
+        self.fsync_every = fsync_every
+        self.compact = compact
+        self.unsynced = 0
+        self.file = open_report_file(output_file, 'w')
+        self._write_line({"type": "header", "metadata": results["metadata"]})
+        self._sync()
+    
+    def _write_line(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+    
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+    
+    def write_response(self, response):
+        self._write_line({"type": "response", "response": compact_response(response) if self.compact else response})
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self._sync()
+    
+    def close(self):
+        self._write_line({
+            "type": "trailer",
+            "metadata": self.results["metadata"],
+            "evaluation_summary": self.results["evaluation_summary"]
+        })
+        self._sync()
+        self.file.close()
+
+def read_jsonl_report(jsonl_file):
+    """
+    Read a JSONL report into the single-JSON report structure. Reports from
+    interrupted runs have no trailer, so their totals are recomputed from the
+    responses that were written.
+    """
+    header = None
+    trailer = None
+    responses = []
+    with open_report_file(jsonl_file, 'r') as f:
+        try:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave the last line half written
+                    print(f"Warning: Skipping unreadable line {line_number} in {jsonl_file}")
+                    continue
+                if record.get("type") == "header":
+                    header = record
+                elif record.get("type") == "response":
+                    responses.append(record["response"])
+                elif record.get("type") == "trailer":
+                    trailer = record
+        except EOFError:
+            # A compressed report from a crashed run ends without its end-of-stream marker
+            print(f"Warning: {jsonl_file} ends early")
+    
+    if trailer is not None:
+        return {
+            "metadata": trailer["metadata"],
+            "responses": responses,
+            "evaluation_summary": trailer["evaluation_summary"]
+        }
+    
+    if header is None:
+        raise ValueError(f"{jsonl_file} has no report header")
+    results = {"metadata": dict(header["metadata"]), "responses": []}
+    writer = JsonReportWriter(None, results)
+    totals = new_run_totals()
+    for response in responses:
+        record_response(writer, totals, response, response.get("evaluation", {}).get("status"))
+    apply_run_totals(results, totals, results["metadata"].get("total_questions", len(responses)))
+    results["metadata"]["incomplete"] = True
+    return results
+
+def load_report(report_file):
+    """Load a report written in either the single-JSON or the JSONL format"""
+    if is_jsonl_report(report_file):
+        return read_jsonl_report(report_file)
+    with open_report_file(report_file, 'r') as f:
+        return json.load(f)
+
+def load_resumable_responses(report_file, questions):
+    """
+    Return the evaluated responses in a previous report that belong to the given
+    questions, one per question id, along with that report's metadata. Errored
+    or missing questions are left out so they get scheduled again.
+    """
+    previous = load_report(report_file)
+    
+    # Older reports have no question id, so fall back to matching the question text
+    id_by_text = {question["text"]: question["id"] for question in questions}
+    wanted_ids = {question["id"] for question in questions}
+    
+    reusable = {}
+    for response in previous.get("responses", []):
+        question_id = response.get("id") or id_by_text.get(response.get("question"))
+        status = response.get("evaluation", {}).get("status")
+        if question_id in wanted_ids and question_id not in reusable and status in EVALUATED_STATUSES:
+            reusable[question_id] = {"id": question_id, **response}
+    
+    return list(reusable.values()), previous.get("metadata", {})
+
+def find_resume_report(report_files, model_info):
+    """Pick the report to resume for a model, matching its name and reasoning effort"""
+    reasoning_effort = None
+    if model_info.get("reasoning_required", False):
+        reasoning_effort = model_info.get("reasoning_effort", model_info.get("default_effort", "medium"))
+    
+    for report_file in report_files:
+        metadata = load_report(report_file).get("metadata", {})
+        if metadata.get("model") == model_info["name"] and metadata.get("reasoning_effort") == reasoning_effort:
+            return report_file
+    return None
+
+def convert_jsonl_report(jsonl_file, json_file=None):
+    """Convert a JSONL report into the single-JSON report format"""
+    if json_file is None:
+        json_file = os.path.splitext(strip_compression_suffix(jsonl_file))[0] + ".json"
+    results = read_jsonl_report(jsonl_file)
+    JsonReportWriter(json_file, results).close()
+    return json_file
+
+def run_questions_threaded(questions, model_info, batch_size, extraction_workers, extraction, on_complete, progress_position=None, stopping=None):
+    """
+    Answer questions on a thread pool, calling on_complete(question, future) as each
+    is evaluated. With stopping, no new questions are started once it says so.
+    """
+    # Keep batch_size questions in flight, starting the next one as soon as any finishes.
+    # Extraction, costing and evaluation run in their own pool as each answer arrives.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=extraction_workers) as extraction_executor:
+        items = questions if stopping is None else stopping.schedule(questions)
+        pipeline = iter_sliding_window(executor, process_question, items, batch_size, model_info,
+                                       then=(extraction_executor, functools.partial(finalize_result, extraction=extraction)))
+        desc = "Processing" if progress_position is None else model_info["name"]
+        for question, future in tqdm(pipeline, total=len(questions), desc=desc, position=progress_position):
+            on_complete(question, future)
+
+async def run_questions_async(questions, model_info, batch_size, extraction_workers, extraction, on_complete, progress_position=None, stopping=None):
+    """
+    Answer questions as coroutines, calling on_complete(question, task) as each is
+    evaluated. With stopping, no new questions are started once it says so.
+    """
+    # The client is created here so it belongs to the running event loop.
+    # Replay runs never reach the network, so they don't need one.
+    async_client = None if response_cache is not None and response_cache.replay else AsyncOpenAI(**client_options())
+    try:
+        items = questions if stopping is None else stopping.schedule(questions)
+        pipeline = iter_sliding_window_async(async_process_question, items, batch_size, model_info, async_client,
+                                             then=(asyncio.Semaphore(extraction_workers),
+                                                   functools.partial(async_finalize_result, extraction=extraction)))
+        desc = "Processing" if progress_position is None else model_info["name"]
+        with tqdm(total=len(questions), desc=desc, position=progress_position) as progress:
+            async for question, task in pipeline:
+                on_complete(question, task)
+                progress.update(1)
+    finally:
+        if async_client is not None:
+            await async_client.close()
+
+class BatchRequestError(Exception):
+    """Raised when a batch has no successful result for a question"""
+
+def write_batch_input(questions, model_info, input_file):
+    """Write the chat completion request for every question to a Batch API input file"""
+    with open(input_file, "w") as f:
+        for question in questions:
+            request = {
+                "custom_id": question["id"],
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": build_question_params(question["text"], {**model_info, "stream": False})
+            }
+            f.write(json.dumps(request) + "\n")
+    return input_file
+
+def submit_batch(input_file, model_info):
+    """Upload a batch input file and start a batch for it"""
+    with open(input_file, "rb") as f:
+        uploaded = get_batch_client().files.create(file=f, purpose="batch")
+    return get_batch_client().batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"model": model_info["name"]}
+    )
+
+def wait_for_batch(batch_id, poll_interval=BATCH_POLL_SECONDS):
+    """Poll a batch until it reaches a final status"""
+    while True:
+        batch = get_batch_client().batches.retrieve(batch_id)
+        if batch.status in BATCH_FINAL_STATUSES:
+            return batch
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} completed, {counts.failed} failed")
+        else:
+            print(f"Batch {batch_id} {batch.status}")
+        time.sleep(poll_interval)
+
+def download_batch_results(batch):
+    """Return the result records of a finished batch, from its output and error files, keyed by custom_id"""
+    records = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in get_batch_client().files.content(file_id).text.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                records[record["custom_id"]] = record
+    return records
+
+def finalize_batch_result(question, record, batch, model_info, extraction="auto"):
+    """Turn a batch result record into a report entry through the usual extraction, costing and evaluation"""
+    # Batches report no per-request latency, only when the batch ran
+    timing_info = {
+        "start_time": datetime.datetime.fromtimestamp(batch.created_at).isoformat(),
+        "end_time": datetime.datetime.fromtimestamp(batch.completed_at or time.time()).isoformat(),
+        "duration_seconds": 0,
+        "batch_id": batch.id
+    }
+    
+    response = (record or {}).get("response") or {}
+    if response.get("status_code") != 200:
+        if record is None:
+            message = f"No result for {question['id']} in batch {batch.id} ({batch.status})"
+        else:
+            error = record.get("error") or response.get("body", {}).get("error") or {}
+            message = f"Batch request failed with status {response.get('status_code')}: {error.get('message', error)}"
+        error = BatchRequestError(message)
+        error.timing_info = timing_info
+        raise error
+    
+    result = {
+        "question_data": question,
+        "response": ChatCompletion.model_validate(response["body"]),
+        "timing_info": timing_info
+    }
+    return finalize_result(result, model_info, extraction)
+
+def run_questions_batch(questions, model_info, extraction_workers, extraction, on_complete, input_file, batch_id=None, poll_interval=BATCH_POLL_SECONDS, progress_position=None):
+    """
+    Answer questions through the Batch API, calling on_complete(question, future) as each is evaluated.
+    Pass batch_id to collect the results of a batch submitted earlier instead of submitting a new one.
+    """
+    if batch_id is None:
+        write_batch_input(questions, model_info, input_file)
+        batch = submit_batch(input_file, model_info)
+        batch_id = batch.id
+        print(f"Submitted batch {batch_id} with {len(questions)} requests from {input_file}")
+        print(f"If this run is interrupted, collect the results later with --batch-id {batch_id}")
+    
+    batch = wait_for_batch(batch_id, poll_interval)
+    print(f"Batch {batch_id} {batch.status}")
+    records = download_batch_results(batch)
+    
+    # Batch requests are billed at a discount to the model's usual prices
+    batch_model_info = {
+        **model_info,
+        "input": model_info["input"] * BATCH_PRICE_FACTOR,
+        "cached_input": model_info.get("cached_input", model_info["input"]) * BATCH_PRICE_FACTOR,
+        "output": model_info["output"] * BATCH_PRICE_FACTOR
+    }
+    
+    # Extraction, costing and evaluation run in a pool as for interactive runs
+    with concurrent.futures.ThreadPoolExecutor(max_workers=extraction_workers) as extraction_executor:
+        futures = {
+            extraction_executor.submit(queued(finalize_batch_result), question, records.get(question["id"]), batch, batch_model_info, extraction): question
+            for question in questions
+        }
+        desc = "Evaluating" if progress_position is None else model_info["name"]
+        for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc=desc, position=progress_position):
+            on_complete(futures[future], future)
+    
+    return batch
+
+def build_prompt_prefix(instructions, examples):
+    """The fixed start of every question prompt: the instructions, then worked examples with their answers"""
+    parts = [instructions.strip()]
+    for number, example in enumerate(examples, 1):
+        answer = ", ".join(letter.upper() for letter in example["correct_answer"])
+        parts.append(f"Example {number}:\n\n{example['text'].rstrip()}\n\nAnswer: {answer}")
+    return "\n\n".join(parts) + "\n"
+
+def split_few_shot_examples(questions, count, seed=0):
+    """Pick count questions as worked examples, stratified across tests, and return (examples, remaining questions)"""
+    if not count:
+        return [], questions
+    examples = stratified_question_order(questions, seed)[:count]
+    example_ids = {id(question) for question in examples}
+    return examples, [question for question in questions if id(question) not in example_ids]
+
+def generate_comprehensive_report(model_info, qa_data_file, output_file, test_id=None, batch_size=BATCH_SIZE, extraction_workers=None, extraction="auto", engine="thread", output_format="json", resume_from=None, questions=None, progress_position=None, rate_limit=False, mode="interactive", batch_id=None, batch_poll_interval=BATCH_POLL_SECONDS, report_schema="full", compression=None, sample=None, sample_seed=0, sample_strategy="stratified", early_stopping=None, prompt_prefix=None, few_shot=0):
     """
     Generate a comprehensive report for a model on questions from qa_data.json.
     This combines the functionality of get_llm_answers.py, analyze_model_answers.py,
     calculate_costs.py, and evaluate_llm_answers.py.
+    
+    Pass questions to reuse a question list already extracted from qa_data.json,
+    and progress_position to give this model its own line in a shared progress display.
+    With rate_limit, requests go through per-model rate limiters using the model's
+    "rpm" and "tpm" budgets. With mode="batch", questions are sent through the Batch API;
+    batch_id collects the results of an earlier batch instead of submitting a new one.
+    report_schema="compact" stores smaller response entries, and compression ("gzip"
+    or "zstd") compresses the report file. With sample, only a seeded sample of that
+    many questions is run (see load_questions); it is recorded in the metadata.
+    early_stopping takes the EarlyStopping settings (target_ci_width, max_cost,
+    confidence, min_questions): questions then run in a seeded, stratified random
+    order and the run stops once the accuracy interval or the cost budget is reached.
+    prompt_prefix (instruction text) starts every prompt with the same instructions
+    and few_shot worked examples taken from the questions, so the provider's prefix
+    cache can hit; the examples are not asked themselves.
     """
     # Create a timestamp for the file name
     script_start_time = datetime.datetime.now()
     script_start_time_str = script_start_time.strftime("%Y%m%d_%H%M%S")
     script_start_time_iso = script_start_time.isoformat()
     
-    # Load qa_data.json
-    qa_data = load_qa_data(qa_data_file)
+    # JSONL reports get their own extension, and compressed reports a suffix after it
+    output_file = strip_compression_suffix(output_file)
+    if output_format == "jsonl" and not output_file.endswith(".jsonl"):
+        output_file = os.path.splitext(output_file)[0] + ".jsonl"
+    output_file = report_path_with_compression(output_file, compression)
     
     # Create a directory for outputs if it doesn't exist
     output_dir = os.path.dirname(output_file)
@@ -330,13 +2423,29 @@ def generate_comprehensive_report(model_info, qa_data_file, output_file, test_id
     model_name = model_info["name"]
     sanitized_model_name = model_name.replace("-", "_")
     
-    # Extract questions from qa_data.json
-    questions = extract_questions_from_qa_data(qa_data, test_id)
+    # Load and extract questions from qa_data.json or a question store unless the caller already did
+    if questions is None:
+        questions = load_questions(qa_data_file, test_id, sample, sample_seed, sample_strategy)
+    
+    # The fixed prompt prefix, built before anything is sent so every request shares it
+    prefix_info = None
+    if prompt_prefix is not None:
+        examples, questions = split_few_shot_examples(questions, few_shot, sample_seed)
+        model_info = {**model_info, "prompt_prefix": build_prompt_prefix(prompt_prefix, examples)}
+        prefix_tokens = len(model_info["prompt_prefix"]) // 4
+        prefix_info = {
+            "sha256": hashlib.sha256(model_info["prompt_prefix"].encode("utf-8")).hexdigest(),
+            "estimated_tokens": prefix_tokens,
+            "few_shot_examples": [example["id"] for example in examples]
+        }
+        if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            print(f"Warning: the prompt prefix is about {prefix_tokens} tokens; providers only cache prefixes of "
+                  f"{PROMPT_CACHE_MIN_TOKENS} tokens or more, so add instructions or --few-shot examples")
     total_questions = len(questions)
     
+    # Raised rather than exiting, so one model's failure doesn't end the other runs of --all-models
     if total_questions == 0:
-        print(f"Error: No questions found in qa_data.json" + (f" for test ID '{test_id}'" if test_id else ""))
-        exit(1)
+        raise ValueError(f"No questions found in qa_data.json" + (f" for test ID '{test_id}'" if test_id else ""))
     
     print(f"Loaded {total_questions} questions from qa_data.json")
     
@@ -347,9 +2456,26 @@ def generate_comprehensive_report(model_info, qa_data_file, output_file, test_id
         "total_questions": total_questions,
         "test_start_time": script_start_time_iso,
         "test_id": f"{sanitized_model_name}_{script_start_time_str}",
-        "batch_size": batch_size
+        "batch_size": batch_size,
+        "extraction_workers": extraction_workers or batch_size,
+        "extraction": extraction,
+        "engine": engine,
+        "mode": mode,
+        "report_schema": report_schema
     }
     
+    if sample:
+        metadata["sample"] = {"size": sample, "seed": sample_seed, "strategy": sample_strategy}
+    
+    if prefix_info is not None:
+        metadata["prompt_prefix"] = prefix_info
+    
+    # Stopping early needs every prefix of the run to be a fair sample of the bank
+    stopping = None
+    if early_stopping:
+        stopping = EarlyStopping(**early_stopping, available_questions=total_questions)
+        questions = stratified_question_order(questions, sample_seed)
+    
     # Add reasoning effort to metadata if applicable
     if model_info.get("reasoning_required", False):
         reasoning_effort = model_info.get("reasoning_effort", model_info.get("default_effort", "medium"))
@@ -361,116 +2487,125 @@ def generate_comprehensive_report(model_info, qa_data_file, output_file, test_id
         "responses": []
     }
     
+    # Reuse evaluated responses from an interrupted run and schedule only the rest
+    previous_responses = []
+    if resume_from:
+        previous_responses, previous_metadata = load_resumable_responses(resume_from, questions)
+        if previous_metadata.get("model") != model_name:
+            print(f"Warning: {resume_from} was generated for model {previous_metadata.get('model')}, not {model_name}")
+        reused_ids = {response["id"] for response in previous_responses}
+        questions = [question for question in questions if question["id"] not in reused_ids]
+        metadata["resumed_from"] = {
+            "file": resume_from,
+            "test_id": previous_metadata.get("test_id"),
+            "reused_responses": len(previous_responses)
+        }
+        print(f"Resuming from {resume_from}: reusing {len(previous_responses)} evaluated responses, {len(questions)} questions left")
+    
     # Initialize counters for evaluation summary
-    total_duration = 0
-    total_prompt_cost = 0
-    total_completion_cost = 0
-    total_reasoning_cost = 0
-    total_cost = 0
-    correct_answers = 0
-    incorrect_answers = 0
-    unanswered_questions = 0
-    
-    # Process questions in batches
-    with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
-        for i in range(0, total_questions, batch_size):
-            batch = questions[i:i+batch_size]
-            batch_size_actual = len(batch)
-            print(f"Processing batch of {batch_size_actual} questions ({i+1}-{i+batch_size_actual}/{total_questions})")
-            
-            # Submit all questions in the batch to the executor
-            future_to_question = {executor.submit(process_question, question, model_info): question for question in batch}
-            
-            # Collect results as they complete
-            batch_results = []
-            for future in tqdm(concurrent.futures.as_completed(future_to_question), total=batch_size_actual, desc="Processing"):
-                try:
-                    result = future.result()
-                    batch_results.append(result)
-                except Exception as exc:
-                    question = future_to_question[future]
-                    print(f"Question generated an exception: {question['id']} - {exc}")
-            
-            # Process each result in the batch
-            for result in batch_results:
-                try:
-                    # Extract answer selections
-                    content = result["response"].choices[0].message.content
-                    selections = extract_answer_selections(content)
-                    
-                    # Convert the response to a dictionary for JSON serialization
-                    response_dict = result["response"].model_dump()
-                    
-                    # Calculate costs
-                    costs = calculate_costs({"response": response_dict}, model_info)
-                    
-                    # Create the response object
-                    response = {
-                        "question": result["question_data"]["text"],
-                        "response": response_dict,
-                        "timing": result["timing_info"],
-                        "costs": costs,
-                        "answer_selections": selections["selected_answers"]
-                    }
-                    
-                    # Evaluate the answer
-                    evaluation, status = evaluate_answer(result, selections["selected_answers"])
-                    response["evaluation"] = evaluation
-                    
-                    # Update counters
-                    total_duration += result["timing_info"]["duration_seconds"]
-                    total_prompt_cost += costs["prompt_cost"]
-                    total_completion_cost += costs["completion_cost"]
-                    total_reasoning_cost += costs["reasoning_cost"]
-                    total_cost += costs["total_cost"]
-                    
-                    if status == "correct":
-                        correct_answers += 1
-                    elif status == "incorrect":
-                        incorrect_answers += 1
-                    elif status == "unanswered":
-                        unanswered_questions += 1
-                    
-                    # Add the response to the results
-                    results["responses"].append(response)
-                except Exception as e:
-                    print(f"Error processing result: {e}")
-                    import traceback
-                    traceback.print_exc()
+    totals = new_run_totals()
     
-    # Update metadata with totals
-    results["metadata"]["total_duration_seconds"] = total_duration
-    results["metadata"]["costs"] = {
-        "total_prompt_cost": total_prompt_cost,
-        "total_completion_cost": total_completion_cost,
-        "total_reasoning_cost": total_reasoning_cost,
-        "total_cost": total_cost
-    }
+    # Stream responses to disk as they complete, or keep them for a single JSON file
+    if output_format == "jsonl":
+        writer = JsonlReportWriter(output_file, results, compact=report_schema == "compact")
+    else:
+        writer = JsonReportWriter(output_file, results, compact=report_schema == "compact")
     
-    # Add evaluation summary to metadata
-    accuracy = correct_answers / total_questions if total_questions > 0 else 0
-    results["metadata"]["total_correct"] = correct_answers
-    results["metadata"]["total_incorrect"] = incorrect_answers
-    results["metadata"]["accuracy"] = accuracy
+    def on_complete(question, future):
+        try:
+            response, status = future.result()
+        except Exception as e:
+            # Failed questions stay in the report as errors so they can be resumed
+            print(f"Question generated an exception: {question['id']} - {e}")
+            response, status = build_error_entry(question, e), "error"
+        record_response(writer, totals, response, status)
+        if stopping is not None:
+            stopping.update(totals)
     
-    # Add full evaluation summary
-    results["evaluation_summary"] = {
-        "total_questions": total_questions,
-        "correct_answers": correct_answers,
-        "incorrect_answers": incorrect_answers,
-        "unanswered_questions": unanswered_questions,
-        "accuracy": accuracy
-    }
+    for response in previous_responses:
+        record_response(writer, totals, response, response["evaluation"]["status"])
+    # Extraction calls of resumed responses were made by the earlier run
+    for counter in ("extraction_requests", "extraction_rate_limited", "extraction_wait_seconds", "extraction_tokens"):
+        totals[counter] = 0
+    if stopping is not None:
+        stopping.update(totals)
+    
+    if extraction_workers is None:
+        extraction_workers = batch_size
+    
+    # Throttle the model and the extraction model with their own limiters. main() creates
+    # the extraction limiter once for all models; this only creates it for library callers
+    if rate_limit:
+        limiter = configure_rate_limiter(model_name, model_info.get("rpm"), model_info.get("tpm"), batch_size)
+        extraction_limiter = configure_rate_limiter(EXTRACTION_MODEL, max_concurrency=extraction_workers)
+    
+    # Wall-clock time for the questions sent in this run, as opposed to the sum of per-call durations
+    run_start_time = time.time()
+    if mode == "batch":
+        print(f"Processing {len(questions)} questions through the Batch API with {extraction_workers} extraction workers")
+        input_file = os.path.splitext(output_file)[0] + "_batch_input.jsonl"
+        batch = run_questions_batch(questions, model_info, extraction_workers, extraction, on_complete, input_file,
+                                    batch_id, batch_poll_interval, progress_position)
+    elif engine == "async":
+        print(f"Processing {len(questions)} questions with the {engine} engine, {batch_size} in flight and {extraction_workers} extraction workers")
+        asyncio.run(run_questions_async(questions, model_info, batch_size, extraction_workers, extraction, on_complete, progress_position, stopping))
+    else:
+        print(f"Processing {len(questions)} questions with the {engine} engine, {batch_size} in flight and {extraction_workers} extraction workers")
+        run_questions_threaded(questions, model_info, batch_size, extraction_workers, extraction, on_complete, progress_position, stopping)
+    
+    makespan = time.time() - run_start_time
+    
+    # A run that stopped early is summarized over the questions it answered
+    questions_run = len(questions)
+    if stopping is not None:
+        questions_run = stopping.answered - len(previous_responses)
+        results["metadata"]["early_stopping"] = stopping.summary(total_questions)
+        total_questions = stopping.answered
+        results["metadata"]["total_questions"] = total_questions
+    
+    apply_run_totals(results, totals, total_questions)
+    results["metadata"]["wall_clock_seconds"] = makespan
+    results["metadata"]["questions_per_second"] = questions_run / makespan if makespan > 0 else None
+    
+    # Batch results carry no per-request latency, so the duration is the batch's turnaround
+    if mode == "batch":
+        batch_duration = (batch.completed_at or time.time()) - batch.created_at
+        results["metadata"]["total_duration_seconds"] = batch_duration
+        results["metadata"]["batch"] = {
+            "id": batch.id,
+            "status": batch.status,
+            "input_file": None if batch_id else input_file,
+            "request_counts": batch.request_counts.model_dump() if batch.request_counts else None,
+            "duration_seconds": batch_duration,
+            "price_factor": BATCH_PRICE_FACTOR
+        }
+    
+    if rate_limit:
+        results["metadata"]["rate_limit"] = {
+            "model": limiter.stats(),
+            "extraction": extraction_rate_limit_stats(extraction_limiter, totals, makespan)
+        }
+    
+    # The report can't include the time spent writing itself; that span is only in the trace
+    if profiler is not None:
+        results["metadata"]["profile"] = profiler.summary()
     
     # Save the results to the output file
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=4)
+    with profile_span("write_report"):
+        writer.close()
     
     print(f"\nComprehensive report saved to {output_file}")
-    print(f"Accuracy: {correct_answers}/{total_questions} correct ({accuracy:.2%})")
+    print(f"Accuracy: {totals['correct']}/{total_questions} correct ({results['evaluation_summary']['accuracy']:.2%})")
     
     return results
 
+def print_profile_summary(summary):
+    """Print the per-stage time breakdown recorded by the profiler"""
+    print(f"\nProfile ({summary['elapsed_ms'] / 1000:.2f}s elapsed):")
+    print(f"{'Stage':<40} {'Count':>8} {'Total ms':>12} {'Mean ms':>10} {'p95 ms':>10} {'Max ms':>10}")
+    for stage, stats in summary["stages"].items():
+        print(f"{stage:<40} {stats['count']:>8} {stats['total_ms']:>12.1f} {stats['mean_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['max_ms']:>10.3f}")
+
 def get_model_info_by_name(model_name):
     """Get model info by name"""
     for model in MODELS:
@@ -482,17 +2617,139 @@ def main():
     parser = argparse.ArgumentParser(description="Generate a comprehensive LLM evaluation report")
     parser.add_argument("--model", help="Model name to use")
     parser.add_argument("--all-models", action="store_true", help="Run evaluation on all available models")
-    parser.add_argument("--qa-data", required=True, help="Path to the qa_data.json file")
-    parser.add_argument("--output", required=True, help="Path to save the output JSON file")
+    parser.add_argument("--qa-data", help="Path to the qa_data.json file, or the question store written by process_qa_to_json.py (required)")
+    parser.add_argument("--output", help="Path to save the output JSON file (required)")
     parser.add_argument("--test-id", help="Specific test ID to process from qa_data.json")
-    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Number of questions to process in parallel")
+    parser.add_argument("--sample", type=int, metavar="N", help="Run a seeded sample of N questions instead of every question")
+    parser.add_argument("--sample-seed", type=int, default=0, help="Random seed for --sample and the early-stopping question order (default: 0)")
+    parser.add_argument("--sample-strategy", choices=["stratified", "random"], default="stratified",
+                        help="'stratified' samples each test in proportion to its size, 'random' samples the whole bank uniformly")
+    parser.add_argument("--target-ci-width", type=float, metavar="WIDTH",
+                        help="Stop early once the accuracy confidence interval is at most this wide (e.g. 0.04 for +/-2%%)")
+    parser.add_argument("--max-cost", type=float, metavar="USD", help="Stop early once the run has cost this many dollars")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the early-stopping accuracy interval (default: 0.95)")
+    parser.add_argument("--prompt-prefix", nargs="?", const="", metavar="PATH",
+                        help="Start every prompt with fixed instructions (from this text file, or built-in ones) so the provider's prefix cache hits")
+    parser.add_argument("--few-shot", type=int, default=0, metavar="N",
+                        help="With --prompt-prefix, add N worked examples from the question bank to the prefix; they are not asked themselves")
+    parser.add_argument("--min-questions", type=int, default=EARLY_STOP_MIN_QUESTIONS,
+                        help=f"Answer at least this many questions before stopping on --target-ci-width (default: {EARLY_STOP_MIN_QUESTIONS})")
+    parser.add_argument("--look-every", type=int, default=EARLY_STOP_LOOK_EVERY, metavar="N",
+                        help=f"Check the accuracy interval against --target-ci-width every N results (default: {EARLY_STOP_LOOK_EVERY})")
+    parser.add_argument("--batch-size", type=int,
+                        help=f"Number of questions to process in parallel (default: each model's concurrency cap, or {BATCH_SIZE})")
+    parser.add_argument("--extraction-workers", type=int, help="Number of answer extractions to run in parallel (default: same as --batch-size)")
+    parser.add_argument("--extraction", choices=["auto", "llm"], default="auto",
+                        help="Answer extraction: 'auto' tries local patterns before GPT-4o, 'llm' always uses GPT-4o")
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread",
+                        help="Concurrency engine: a thread pool, or asyncio with AsyncOpenAI for very high concurrency")
+    parser.add_argument("--cache-dir", help="Cache responses on disk in this directory and reuse them for identical requests")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB, help="Size cap for the response cache; least recently used entries are evicted")
+    parser.add_argument("--replay", action="store_true",
+                        help=f"Rebuild the report from the response cache only, without network access (default cache: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--extraction-memo", nargs="?", const=DEFAULT_EXTRACTION_MEMO,
+                        help=f"Memoize GPT-4o answer extractions by response content in this SQLite file (default: {DEFAULT_EXTRACTION_MEMO})")
+    parser.add_argument("--clear-extraction-memo", action="store_true", help="Invalidate every memoized answer extraction before the run")
+    parser.add_argument("--output-format", choices=["json", "jsonl"], default="json",
+                        help="Write a single JSON report at the end, or stream one JSONL record per response as it completes")
+    parser.add_argument("--report-schema", choices=["full", "compact"], default="full",
+                        help="'compact' refers to questions by id and keeps only the content, usage and finish_reason of each response")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], help="Compress the report file (zstd needs the zstandard package)")
+    parser.add_argument("--convert-jsonl", metavar="PATH", help="Convert a JSONL report (complete or interrupted) to the single-JSON format and exit")
+    parser.add_argument("--resume", nargs="+", metavar="REPORT",
+                        help="Resume interrupted run(s): reuse evaluated responses from these reports and only run missing or errored questions")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Throttle requests with per-model token buckets and adapt concurrency to 429s and x-ratelimit-* headers")
+    parser.add_argument("--rpm", type=int, help="Requests per minute budget for the evaluated model(s) (implies --rate-limit)")
+    parser.add_argument("--tpm", type=int, help="Tokens per minute budget for the evaluated model(s) (implies --rate-limit)")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"Retry failed requests (timeouts, connection errors, 429s, 5xx) up to this many times with jittered exponential backoff (default: {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--request-timeout", type=float, help="Deadline in seconds for each API call, including all of a streamed response")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request once a call has run longer than --hedge-percentile of the latencies seen so far, and use whichever finishes first")
+    parser.add_argument("--hedge-percentile", type=float, default=95, help="Latency percentile after which requests are hedged (default: 95)")
+    parser.add_argument("--mode", choices=["interactive", "batch"], default="interactive",
+                        help="Send requests one by one, or through the Batch API at a lower price with results within 24 hours")
+    parser.add_argument("--batch-id", help="With --mode batch, collect the results of this previously submitted batch instead of submitting a new one")
+    parser.add_argument("--batch-poll-interval", type=float, default=BATCH_POLL_SECONDS,
+                        help=f"Seconds between batch status checks (default: {BATCH_POLL_SECONDS})")
+    parser.add_argument("--base-url", help="Send API requests to this base URL, e.g. a local mock server at http://127.0.0.1:8765/v1")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream answers to record time to first token, inter-token latency and output tokens per second")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every pipeline stage for every question and add a per-stage breakdown to the report")
+    parser.add_argument("--profile-trace", metavar="PATH", help="Also write the profile as a Chrome trace-event JSON file (implies --profile)")
     parser.add_argument("--reasoning-effort", choices=["low", "medium", "high"], help="Reasoning effort for models that support it")
     
     args = parser.parse_args()
     
+    # Convert a JSONL report without running anything
+    if args.convert_jsonl:
+        json_file = convert_jsonl_report(args.convert_jsonl, args.output)
+        print(f"Converted {args.convert_jsonl} to {json_file}")
+        return
+    
+    if not args.qa_data or not args.output:
+        parser.error("--qa-data and --output are required")
+    
     # Print current working directory for debugging
     print(f"Current working directory: {os.getcwd()}")
     
+    # Set up the response cache; replay implies the default cache location
+    if args.cache_dir or args.replay:
+        cache = configure_response_cache(args.cache_dir or DEFAULT_CACHE_DIR, args.cache_max_mb, args.replay)
+        print(f"Using response cache at {cache.directory}" + (" (replay mode, no network access)" if args.replay else ""))
+    
+    # Set up the answer extraction memo
+    if args.extraction_memo or args.clear_extraction_memo:
+        memo = configure_extraction_memo(args.extraction_memo or DEFAULT_EXTRACTION_MEMO, args.clear_extraction_memo)
+        print(f"Using answer extraction memo at {memo.path}" + (" (cleared)" if args.clear_extraction_memo else ""))
+    
+    # The OpenAI clients read the base URL from the environment when they are created
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    
+    if args.batch_id and (args.mode != "batch" or args.all_models):
+        parser.error("--batch-id requires --mode batch and a single --model")
+    
+    # Instructions for the fixed prompt prefix, from a file or built in
+    prompt_prefix = None
+    if args.prompt_prefix is not None:
+        if args.prompt_prefix:
+            with open(args.prompt_prefix, "r", encoding="utf-8") as f:
+                prompt_prefix = f.read()
+        else:
+            prompt_prefix = DEFAULT_PROMPT_INSTRUCTIONS
+    elif args.few_shot:
+        parser.error("--few-shot needs --prompt-prefix")
+    
+    # Early stopping is on when a target is given; a batch is submitted whole, so it can't stop early
+    early_stopping = None
+    if args.target_ci_width is not None or args.max_cost is not None:
+        if args.mode == "batch":
+            parser.error("--target-ci-width and --max-cost need --mode interactive")
+        early_stopping = {
+            "target_ci_width": args.target_ci_width,
+            "max_cost": args.max_cost,
+            "confidence": args.confidence,
+            "min_questions": args.min_questions,
+            "look_every": args.look_every
+        }
+    
+    if args.profile or args.profile_trace:
+        configure_profiler()
+    
+    configure_request_policy(args.max_retries, args.request_timeout, args.hedge, args.hedge_percentile)
+    
+    # Budgets on the command line turn rate limiting on
+    rate_limit = args.rate_limit or bool(args.rpm) or bool(args.tpm)
+    
+    # One extraction limiter is shared by every model run in this process, so it is set up once here
+    if rate_limit:
+        models_run = MODELS if args.all_models else [get_model_info_by_name(args.model) or {}]
+        configure_rate_limiter(EXTRACTION_MODEL, max_concurrency=args.extraction_workers or args.batch_size
+                               or max(model.get("concurrency", BATCH_SIZE) for model in models_run))
+    
     # Check if either --model or --all-models is provided
     if not args.model and not args.all_models:
         print("Error: Either --model or --all-models must be specified")
@@ -501,59 +2758,101 @@ def main():
     
     # If --all-models is specified, run evaluation for all models
     if args.all_models:
-        print(f"Running evaluation on all {len(MODELS)} available models")
+        # Skip duplicate model entries with different reasoning efforts
+        # We'll handle reasoning effort separately
+        selected_models = []
+        for model_info in MODELS:
+            if model_info["name"] not in [model["name"] for model in selected_models]:
+                selected_models.append(model_info)
         
-        # Create a list to store results for all models
-        all_results = []
+        print(f"Running evaluation on all {len(selected_models)} available models concurrently")
         
-        # Process each model
-        for model_info in MODELS:
+        # Parse the question bank once and share it between models
+        questions = load_questions(args.qa_data, args.test_id, args.sample, args.sample_seed, args.sample_strategy)
+        if not questions:
+            print(f"Error: No questions found in qa_data.json" + (f" for test ID '{args.test_id}'" if args.test_id else ""))
+            exit(1)
+        
+        # Add timestamp to output file
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        def run_model(model_info, position):
             model_name = model_info["name"]
             
-            # Skip duplicate model entries with different reasoning efforts
-            # We'll handle reasoning effort separately
-            if args.all_models and model_name in [result.get("model_name") for result in all_results]:
-                continue
-                
-            print(f"\n{'='*80}\nProcessing model: {model_name}\n{'='*80}")
-            
             # Set reasoning effort if specified and applicable
             if args.reasoning_effort and model_info.get("reasoning_required", False):
                 model_info = model_info.copy()  # Create a copy to avoid modifying the original
                 model_info["reasoning_effort"] = args.reasoning_effort
             
-            # Add timestamp to output file
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            if args.stream:
+                model_info = {**model_info, "stream": True}
             
-            # Create model-specific output filename
-            if "." in os.path.basename(args.output):
-                base, ext = os.path.splitext(args.output)
+            # Override the model's rate limit budgets if specified
+            if args.rpm or args.tpm:
+                model_info = {**model_info, "rpm": args.rpm or model_info.get("rpm"), "tpm": args.tpm or model_info.get("tpm")}
+            
+            # Create model-specific output filename; a compression suffix is added back later
+            output = strip_compression_suffix(args.output)
+            if "." in os.path.basename(output):
+                base, ext = os.path.splitext(output)
                 output_file = f"{base}_{model_name.replace('-', '_')}_{timestamp}{ext}"
             else:
-                output_file = f"{args.output}_{model_name.replace('-', '_')}_{timestamp}.json"
+                output_file = f"{output}_{model_name.replace('-', '_')}_{timestamp}.json"
             
-            try:
-                # Generate the comprehensive report for this model
-                result = generate_comprehensive_report(
-                    model_info=model_info,
-                    qa_data_file=args.qa_data,
-                    output_file=output_file,
-                    test_id=args.test_id,
-                    batch_size=args.batch_size
-                )
-                
-                # Store basic result info
-                all_results.append({
-                    "model_name": model_name,
-                    "output_file": output_file,
-                    "accuracy": result["evaluation_summary"]["accuracy"],
-                    "total_cost": result["metadata"]["costs"]["total_cost"]
-                })
-                
-            except Exception as e:
-                print(f"Error generating report for model {model_name}: {e}")
-                import traceback
-                traceback.print_exc()
+            # Find this model's interrupted report, if any
+            resume_from = None
+            if args.resume:
+                resume_from = find_resume_report(args.resume, model_info)
+                if resume_from is None:
+                    print(f"No report to resume for {model_name}, starting a new run")
+            
+            # Generate the comprehensive report for this model with its own concurrency cap
+            result = generate_comprehensive_report(
+                model_info=model_info,
+                qa_data_file=args.qa_data,
+                output_file=output_file,
+                test_id=args.test_id,
+                batch_size=args.batch_size or model_info.get("concurrency", BATCH_SIZE),
+                extraction_workers=args.extraction_workers,
+                extraction=args.extraction,
+                engine=args.engine,
+                output_format=args.output_format,
+                resume_from=resume_from,
+                questions=questions,
+                progress_position=position,
+                rate_limit=rate_limit,
+                mode=args.mode,
+                batch_poll_interval=args.batch_poll_interval,
+                report_schema=args.report_schema,
+                compression=args.compress or compression_of(args.output),
+                sample=args.sample,
+                sample_seed=args.sample_seed,
+                sample_strategy=args.sample_strategy,
+                early_stopping=early_stopping,
+                prompt_prefix=prompt_prefix,
+                few_shot=args.few_shot
+            )
+            
+            # Store basic result info
+            return {
+                "model_name": model_name,
+                "output_file": output_file,
+                "accuracy": result["evaluation_summary"]["accuracy"],
+                "total_cost": result["metadata"]["costs"]["total_cost"]
+            }
+        
+        # Evaluate every model at once; wall time is close to that of the slowest model
+        all_results = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(selected_models)) as executor:
+            futures = [executor.submit(run_model, model_info, position) for position, model_info in enumerate(selected_models)]
+            for model_info, future in zip(selected_models, futures):
+                try:
+                    all_results.append(future.result())
+                except (Exception, SystemExit) as e:
+                    # A helper that calls exit() fails only its own model's run
+                    print(f"Error generating report for model {model_info['name']}: {e}")
+                    import traceback
+                    traceback.print_exc()
         
         # Print summary of all model results
         print("\n\n" + "="*80)
@@ -579,9 +2878,23 @@ def main():
         if args.reasoning_effort and model_info.get("reasoning_required", False):
             model_info["reasoning_effort"] = args.reasoning_effort
         
+        if args.stream:
+            model_info["stream"] = True
+        
+        # Override the model's rate limit budgets if specified
+        if args.rpm:
+            model_info["rpm"] = args.rpm
+        if args.tpm:
+            model_info["tpm"] = args.tpm
+        
+        # Pick the report to resume when several are given
+        resume_from = None
+        if args.resume:
+            resume_from = args.resume[0] if len(args.resume) == 1 else find_resume_report(args.resume, model_info)
+        
         # Add timestamp to output file
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = args.output
+        output_file = strip_compression_suffix(args.output)
         
         # Check if the output file has an extension
         if "." in os.path.basename(output_file):
@@ -597,13 +2910,36 @@ def main():
                 qa_data_file=args.qa_data,
                 output_file=output_file,
                 test_id=args.test_id,
-                batch_size=args.batch_size
+                batch_size=args.batch_size or model_info.get("concurrency", BATCH_SIZE),
+                extraction_workers=args.extraction_workers,
+                extraction=args.extraction,
+                engine=args.engine,
+                output_format=args.output_format,
+                resume_from=resume_from,
+                rate_limit=rate_limit,
+                mode=args.mode,
+                batch_id=args.batch_id,
+                batch_poll_interval=args.batch_poll_interval,
+                report_schema=args.report_schema,
+                compression=args.compress or compression_of(args.output),
+                sample=args.sample,
+                sample_seed=args.sample_seed,
+                sample_strategy=args.sample_strategy,
+                early_stopping=early_stopping,
+                prompt_prefix=prompt_prefix,
+                few_shot=args.few_shot
             )
         except Exception as e:
             print(f"Error generating comprehensive report: {e}")
             import traceback
             traceback.print_exc()
             exit(1)
+    
+    # The profile covers every model run by this process
+    if profiler is not None:
+        print_profile_summary(profiler.summary())
+        if args.profile_trace:
+            print(f"Chrome trace written to {profiler.write_chrome_trace(args.profile_trace)}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
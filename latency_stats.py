@@ -0,0 +1,104 @@
+"""
+Latency percentiles and mergeable latency histograms, shared by
+generate_comprehensive_report.py and summarize_llm_results.py.
+
+Histograms use log-spaced buckets so the relative error of a percentile read from
+them is bounded (about 5% with the default growth factor) at any scale. Bucket counts
+from different runs can be added together, which averaging percentiles cannot do.
+"""
+
+import math
+
+# Bucket i covers [HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH**i, HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH**(i + 1))
+HISTOGRAM_MIN_SECONDS = 0.001
+HISTOGRAM_GROWTH = 1.1
+
+# Percentiles reported for every latency distribution
+REPORTED_PERCENTILES = (50, 90, 95, 99)
+
+def new_histogram():
+    """Create an empty latency histogram"""
+    return {
+        "min_seconds": HISTOGRAM_MIN_SECONDS,
+        "growth": HISTOGRAM_GROWTH,
+        "count": 0,
+        "sum_seconds": 0,
+        "max_seconds": 0,
+        "counts": {}
+    }
+
+def histogram_add(histogram, seconds):
+    """Count one latency in a histogram"""
+    if seconds <= histogram["min_seconds"]:
+        index = 0
+    else:
+        index = int(math.log(seconds / histogram["min_seconds"]) / math.log(histogram["growth"]))
+    # Bucket indices are strings so histograms survive a JSON round trip unchanged
+    key = str(index)
+    histogram["counts"][key] = histogram["counts"].get(key, 0) + 1
+    histogram["count"] += 1
+    histogram["sum_seconds"] += seconds
+    histogram["max_seconds"] = max(histogram["max_seconds"], seconds)
+    return histogram
+
+def merge_histograms(histograms):
+    """Add up histograms from several runs; histograms with other bucket settings are skipped"""
+    merged = new_histogram()
+    for histogram in histograms:
+        if not histogram:
+            continue
+        if histogram.get("min_seconds") != merged["min_seconds"] or histogram.get("growth") != merged["growth"]:
+            print("Warning: skipping a latency histogram with different bucket settings")
+            continue
+        for key, count in histogram["counts"].items():
+            merged["counts"][key] = merged["counts"].get(key, 0) + count
+        merged["count"] += histogram["count"]
+        merged["sum_seconds"] += histogram["sum_seconds"]
+        merged["max_seconds"] = max(merged["max_seconds"], histogram["max_seconds"])
+    return merged
+
+def histogram_percentile(histogram, percentile):
+    """Estimate a latency percentile from a histogram, or None if it is empty"""
+    if histogram["count"] == 0:
+        return None
+    rank = math.ceil(histogram["count"] * percentile / 100)
+    seen = 0
+    for index in sorted(int(key) for key in histogram["counts"]):
+        seen += histogram["counts"][str(index)]
+        if seen >= max(rank, 1):
+            # Use the bucket's geometric midpoint, but never more than the largest value seen
+            lower = histogram["min_seconds"] * histogram["growth"] ** index
+            return min(lower * math.sqrt(histogram["growth"]), histogram["max_seconds"])
+    return histogram["max_seconds"]
+
+def exact_percentile(ordered, percentile):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    rank = max(math.ceil(len(ordered) * percentile / 100), 1)
+    return ordered[rank - 1]
+
+def summarize_latencies(latencies):
+    """Exact percentiles and a mergeable histogram for a list of latencies in seconds"""
+    ordered = sorted(latencies)
+    histogram = new_histogram()
+    for seconds in ordered:
+        histogram_add(histogram, seconds)
+    
+    summary = {"count": len(ordered)}
+    for percentile in REPORTED_PERCENTILES:
+        summary[f"p{percentile}_seconds"] = exact_percentile(ordered, percentile)
+    summary["max_seconds"] = ordered[-1] if ordered else None
+    summary["mean_seconds"] = sum(ordered) / len(ordered) if ordered else None
+    summary["histogram"] = histogram
+    return summary
+
+def summarize_histogram(histogram):
+    """Percentiles estimated from a (possibly merged) histogram, in the same shape as summarize_latencies"""
+    summary = {"count": histogram["count"]}
+    for percentile in REPORTED_PERCENTILES:
+        summary[f"p{percentile}_seconds"] = histogram_percentile(histogram, percentile)
+    summary["max_seconds"] = histogram["max_seconds"] if histogram["count"] else None
+    summary["mean_seconds"] = histogram["sum_seconds"] / histogram["count"] if histogram["count"] else None
+    summary["histogram"] = histogram
+    return summary
@@ -0,0 +1,550 @@
+"""
+A local stand-in for the parts of the OpenAI API used by generate_comprehensive_report.py,
+so runs can be tested without network access. Point the harness at it with
+--base-url http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY value.
+
+Supports chat completions (including json_schema response formats and streaming),
+file uploads and downloads, and the Batch API for /v1/chat/completions. Latency,
+error and 429 rates are configurable, answers can be scripted per question, and
+repeated prompt prefixes are reported as cached tokens like the provider's prefix
+cache, so the harness's own throughput can be measured offline at any scale.
+"""
+
+import json
+import math
+import re
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+import email.parser
+import email.policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DEFAULT_PORT = 8765
+
+# Seconds a batch spends in progress before it completes
+DEFAULT_BATCH_LATENCY = 2.0
+
+# Option letters are listed on their own line in the formatted questions
+OPTION_LINE_PATTERN = re.compile(r"^([A-Z])$", re.MULTILINE)
+
+# Final answer line in a model response, read when answering extraction requests
+ANSWER_LINE_PATTERN = re.compile(r"Answer:\s*([A-Z](?:\s*,\s*[A-Z])*)")
+
+# The question text ends where format_question_with_options starts listing options
+QUESTION_END_MARKER = "\n\nReport Content Errors"
+
+# Prompt caching: prefixes are cached in blocks of this many characters (128 tokens),
+# and only once a prompt shares at least PROMPT_CACHE_MIN_TOKENS with an earlier one
+PROMPT_CACHE_BLOCK_CHARACTERS = 512
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Content chunks sent per streamed response are about this many characters long
+STREAM_CHUNK_CHARACTERS = 4
+
+# Server settings, set from the command line in main()
+settings = {
+    "batch_latency": DEFAULT_BATCH_LATENCY,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1.0,
+    "latency": lambda: 0.0,
+    "tokens_per_second": 0.0,
+    "accuracy": None,
+    "seed": 0,
+    "prompt_cache": True
+}
+
+# Scripted answers keyed by question text, loaded by load_script() and load_answer_key()
+scripted_answers = {}
+
+# Uploaded and generated files, and batches, keyed by id
+files = {}
+batches = {}
+prompt_cache_blocks = set()
+state_lock = threading.RLock()
+
+# Request counters, served at /v1/mock/stats
+stats = {
+    "chat_completions": 0,
+    "streamed": 0,
+    "rate_limited": 0,
+    "errors": 0,
+    "batches": 0,
+    "cached_tokens": 0
+}
+
+def new_id(prefix):
+    """Return a random id in the API's style"""
+    return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token"""
+    return max(1, len(text) // 4)
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution in seconds: fixed:S, uniform:LOW,HIGH,
+    lognormal:MEDIAN,SIGMA or exponential:MEAN. Returns a function drawing one sample.
+    """
+    kind, _, values = spec.partition(":")
+    try:
+        params = [float(value) for value in values.split(",")] if values else []
+        if kind == "fixed" and len(params) == 1:
+            return lambda: params[0]
+        if kind == "uniform" and len(params) == 2:
+            return lambda: random.uniform(params[0], params[1])
+        if kind == "lognormal" and len(params) == 2:
+            return lambda: random.lognormvariate(math.log(params[0]), params[1])
+        if kind == "exponential" and len(params) == 1:
+            return lambda: random.expovariate(1 / params[0])
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec}")
+
+def load_script(path):
+    """
+    Load scripted answers from a JSON object mapping question text to either a list
+    of option letters or the full response content to return
+    """
+    with open(path, "r") as f:
+        scripted_answers.update(json.load(f))
+    return len(scripted_answers)
+
+def load_answer_key(path):
+    """Script the correct answer for every question in a qa_data.json file"""
+    with open(path, "r") as f:
+        qa_data = json.load(f)
+    for test_questions in qa_data.values():
+        for question in test_questions:
+            scripted_answers.setdefault(question.get("question", ""), [letter.upper() for letter in question.get("correct_answer", [])])
+    return len(scripted_answers)
+
+def write_synthetic_qa_data(path, num_questions, num_options=4):
+    """Write a qa_data.json file with generated questions, for load tests"""
+    letters = [chr(ord("A") + i) for i in range(num_options)]
+    questions = [
+        {
+            "id": f"synthetic-{i}",
+            "question": f"Synthetic question {i}: which option is correct?",
+            "options": {letter: f"Option {letter} for question {i}" for letter in letters},
+            "correct_answer": [random.choice(letters).lower()]
+        }
+        for i in range(num_questions)
+    ]
+    with open(path, "w") as f:
+        json.dump({"synthetic": questions}, f, indent=2)
+    return path
+
+def prompt_hash(prompt, salt=""):
+    """Stable number derived from a prompt, so answers don't change between runs"""
+    digest = hashlib.sha256(f"{settings['seed']}:{salt}:{prompt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+def cached_prompt_tokens(prompt):
+    """
+    Simulate the provider's prefix cache: return how many tokens at the start of the
+    prompt were already seen in an earlier prompt, and remember this one's prefixes
+    """
+    if not settings["prompt_cache"]:
+        return 0
+    digest = hashlib.sha256()
+    cached_blocks = 0
+    missed = False
+    with state_lock:
+        for start in range(0, len(prompt) - PROMPT_CACHE_BLOCK_CHARACTERS + 1, PROMPT_CACHE_BLOCK_CHARACTERS):
+            # Each block's key covers everything before it, so only whole prefixes match
+            digest.update(prompt[start:start + PROMPT_CACHE_BLOCK_CHARACTERS].encode("utf-8"))
+            key = digest.copy().digest()
+            if not missed and key in prompt_cache_blocks:
+                cached_blocks += 1
+            else:
+                missed = True
+                prompt_cache_blocks.add(key)
+    cached_tokens = cached_blocks * PROMPT_CACHE_BLOCK_CHARACTERS // 4
+    return cached_tokens if cached_tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+
+def choose_answer(prompt):
+    """Pick the answer content for a question, the same every time for the same prompt"""
+    question_text = prompt.split(QUESTION_END_MARKER)[0]
+    letters = OPTION_LINE_PATTERN.findall(prompt) or ["A"]
+    answer = scripted_answers.get(question_text)
+    
+    if isinstance(answer, str):
+        return answer
+    if answer:
+        # With --accuracy, answer some scripted questions wrong on purpose
+        accuracy = settings["accuracy"]
+        if accuracy is None or prompt_hash(prompt, "accuracy") % 10000 < accuracy * 10000:
+            return f"Answer: {', '.join(answer)}"
+        wrong = [letter for letter in letters if letter not in answer] or letters
+        return f"Answer: {wrong[prompt_hash(prompt) % len(wrong)]}"
+    
+    return f"The best option is the one that matches the question.\n\nAnswer: {letters[prompt_hash(prompt) % len(letters)]}"
+
+def build_chat_completion(body):
+    """Build a chat completion response for a /v1/chat/completions request body"""
+    messages = body.get("messages", [])
+    prompt = "\n".join(message.get("content") or "" for message in messages)
+    
+    # Structured-output requests are answer extractions: read the final answer line back
+    if body.get("response_format", {}).get("type") == "json_schema":
+        match = ANSWER_LINE_PATTERN.search(prompt)
+        selected = re.findall(r"[A-Z]", match.group(1)) if match else []
+        content = json.dumps({"selected_answers": selected})
+    else:
+        # The question is the last message; earlier ones are a fixed prefix with worked examples
+        content = choose_answer(messages[-1].get("content") or "" if messages else "")
+    
+    prompt_tokens = estimate_tokens(prompt)
+    cached_tokens = cached_prompt_tokens(prompt)
+    if cached_tokens:
+        with state_lock:
+            stats["cached_tokens"] += cached_tokens
+    completion_tokens = estimate_tokens(content)
+    reasoning_tokens = completion_tokens * 4 if body.get("reasoning_effort") else 0
+    
+    return {
+        "id": new_id("chatcmpl"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content}
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens + reasoning_tokens,
+            "total_tokens": prompt_tokens + completion_tokens + reasoning_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            "completion_tokens_details": {"reasoning_tokens": reasoning_tokens}
+        }
+    }
+
+def build_stream_chunks(completion):
+    """Split a chat completion into the chunks a streamed response would send, usage last"""
+    base = {
+        "id": completion["id"],
+        "object": "chat.completion.chunk",
+        "created": completion["created"],
+        "model": completion["model"]
+    }
+    content = completion["choices"][0]["message"]["content"]
+    chunks = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}]
+    for start in range(0, len(content), STREAM_CHUNK_CHARACTERS):
+        chunks.append({**base, "choices": [{"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_CHARACTERS]}, "finish_reason": None}]})
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    chunks.append({**base, "choices": [], "usage": completion["usage"]})
+    return chunks
+
+def count(counter):
+    with state_lock:
+        stats[counter] += 1
+
+def store_file(content, filename, purpose):
+    """Keep a file in memory and return its file object"""
+    file_object = {
+        "id": new_id("file"),
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed"
+    }
+    with state_lock:
+        files[file_object["id"]] = {"object": file_object, "content": content}
+    return file_object
+
+def run_batch(batch):
+    """Answer every request in a batch's input file and attach the output and error files"""
+    output_lines = []
+    error_lines = []
+    content = files[batch["input_file_id"]]["content"].decode("utf-8")
+    
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        result = {"id": new_id("batch_req"), "custom_id": request.get("custom_id")}
+        
+        if request.get("url") != batch["endpoint"]:
+            result["response"] = None
+            result["error"] = {"code": "invalid_url", "message": f"Request url {request.get('url')} does not match the batch endpoint"}
+            error_lines.append(result)
+        elif random.random() < settings["error_rate"]:
+            result["response"] = {
+                "status_code": 500,
+                "request_id": new_id("req"),
+                "body": {"error": {"message": "The server had an error processing the request", "type": "server_error"}}
+            }
+            result["error"] = None
+            error_lines.append(result)
+        else:
+            result["response"] = {
+                "status_code": 200,
+                "request_id": new_id("req"),
+                "body": build_chat_completion(request.get("body", {}))
+            }
+            result["error"] = None
+            output_lines.append(result)
+    
+    now = int(time.time())
+    batch["status"] = "completed"
+    batch["finalizing_at"] = now
+    batch["completed_at"] = now
+    batch["request_counts"] = {
+        "total": len(output_lines) + len(error_lines),
+        "completed": len(output_lines),
+        "failed": len(error_lines)
+    }
+    if output_lines:
+        batch["output_file_id"] = store_file(("\n".join(json.dumps(line) for line in output_lines) + "\n").encode("utf-8"),
+                                             "batch_output.jsonl", "batch_output")["id"]
+    if error_lines:
+        batch["error_file_id"] = store_file(("\n".join(json.dumps(line) for line in error_lines) + "\n").encode("utf-8"),
+                                            "batch_errors.jsonl", "batch_output")["id"]
+
+def refresh_batch(batch):
+    """Move a batch along its lifecycle based on how long ago it was created"""
+    if batch["status"] == "validating":
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = int(time.time())
+    if batch["status"] == "in_progress" and time.time() - batch["created_at"] >= settings["batch_latency"]:
+        run_batch(batch)
+    return batch
+
+def parse_multipart(content_type, body):
+    """Return the fields and (filename, content) files of a multipart/form-data body"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("utf-8") + b"\r\n\r\n" + body)
+    fields = {}
+    uploads = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if part.get_filename() is not None:
+            uploads[name] = (part.get_filename(), part.get_payload(decode=True))
+        else:
+            fields[name] = part.get_content().strip()
+    return fields, uploads
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Routes API requests to the chat completion simulator and the in-memory files and batches"""
+    
+    # Keep connections open between requests, like the real API
+    protocol_version = "HTTP/1.1"
+    
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def send_error_json(self, status, message, error_type="invalid_request_error", headers=None):
+        self.send_json(status, {"error": {"message": message, "type": error_type}}, headers)
+    
+    def handle_chat_completion(self, request):
+        """Answer a chat completion after a simulated delay, or fail with a 429 or 500"""
+        count("chat_completions")
+        roll = random.random()
+        if roll < settings["rate_limit_rate"]:
+            count("rate_limited")
+            return self.send_error_json(429, "Rate limit reached", "requests", {"retry-after": str(settings["retry_after"])})
+        if roll < settings["rate_limit_rate"] + settings["error_rate"]:
+            count("errors")
+            return self.send_error_json(500, "The server had an error processing the request", "server_error")
+        
+        completion = build_chat_completion(request)
+        
+        # Latency is time to first token, plus generation time at the configured output rate
+        first_token_delay = max(0.0, settings["latency"]())
+        generation_time = completion["usage"]["completion_tokens"] / settings["tokens_per_second"] if settings["tokens_per_second"] > 0 else 0.0
+        
+        if not request.get("stream"):
+            time.sleep(first_token_delay + generation_time)
+            return self.send_json(200, completion)
+        
+        # Streamed responses are server-sent events ending with [DONE]; the connection closes afterwards
+        count("streamed")
+        chunks = build_stream_chunks(completion)
+        include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+        if not include_usage:
+            chunks = chunks[:-1]
+        content_chunks = sum(1 for chunk in chunks if chunk["choices"] and chunk["choices"][0]["delta"].get("content"))
+        time.sleep(first_token_delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for chunk in chunks:
+            if generation_time > 0 and chunk["choices"] and chunk["choices"][0]["delta"].get("content"):
+                time.sleep(generation_time / content_chunks)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+    
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_body()
+        
+        if path == "/v1/chat/completions":
+            return self.handle_chat_completion(json.loads(body))
+        
+        if path == "/v1/files":
+            fields, uploads = parse_multipart(self.headers["Content-Type"], body)
+            if "file" not in uploads:
+                return self.send_error_json(400, "Missing file")
+            filename, content = uploads["file"]
+            return self.send_json(200, store_file(content, filename, fields.get("purpose", "batch")))
+        
+        if path == "/v1/batches":
+            request = json.loads(body)
+            if request.get("input_file_id") not in files:
+                return self.send_error_json(404, f"No such file: {request.get('input_file_id')}")
+            batch = {
+                "id": new_id("batch"),
+                "object": "batch",
+                "endpoint": request.get("endpoint"),
+                "errors": None,
+                "input_file_id": request["input_file_id"],
+                "completion_window": request.get("completion_window", "24h"),
+                "status": "validating",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "expires_at": int(time.time()) + 24 * 3600,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                "metadata": request.get("metadata")
+            }
+            with state_lock:
+                batches[batch["id"]] = batch
+            count("batches")
+            return self.send_json(200, batch)
+        
+        match = re.fullmatch(r"/v1/batches/([^/]+)/cancel", path)
+        if match and match.group(1) in batches:
+            with state_lock:
+                batch = batches[match.group(1)]
+                if batch["status"] in ("validating", "in_progress"):
+                    batch["status"] = "cancelled"
+                    batch["cancelled_at"] = int(time.time())
+            return self.send_json(200, batch)
+        
+        self.send_error_json(404, f"Unknown endpoint: POST {path}")
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        
+        if path == "/v1/mock/stats":
+            with state_lock:
+                return self.send_json(200, dict(stats))
+        
+        match = re.fullmatch(r"/v1/batches/([^/]+)", path)
+        if match:
+            with state_lock:
+                batch = batches.get(match.group(1))
+                if batch is None:
+                    return self.send_error_json(404, f"No such batch: {match.group(1)}")
+                return self.send_json(200, refresh_batch(batch))
+        
+        match = re.fullmatch(r"/v1/files/([^/]+)/content", path)
+        if match:
+            stored = files.get(match.group(1))
+            if stored is None:
+                return self.send_error_json(404, f"No such file: {match.group(1)}")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(stored["content"])))
+            self.end_headers()
+            self.wfile.write(stored["content"])
+            return
+        
+        match = re.fullmatch(r"/v1/files/([^/]+)", path)
+        if match and match.group(1) in files:
+            return self.send_json(200, files[match.group(1)]["object"])
+        
+        self.send_error_json(404, f"Unknown endpoint: GET {path}")
+    
+    def log_message(self, format, *args):
+        # Keep the console quiet; the harness has its own progress output
+        pass
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded server with a listen backlog deep enough for high-concurrency load tests"""
+    daemon_threads = True
+    request_queue_size = 4096
+
+def start_server(port=DEFAULT_PORT, host="127.0.0.1"):
+    """Start the server on a background thread and return it; port 0 picks a free port"""
+    server = MockOpenAIServer((host, port), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--batch-latency", type=float, default=DEFAULT_BATCH_LATENCY,
+                        help=f"Seconds before a submitted batch completes (default: {DEFAULT_BATCH_LATENCY})")
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("fixed:0"),
+                        help="Time to first token distribution: fixed:S, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA or exponential:MEAN (default: fixed:0)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Output rate used to add generation time to each response (default: instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500 server error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of chat completion requests rejected with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses (default: 1)")
+    parser.add_argument("--script", help="JSON file mapping question text to the option letters (or full response) to answer with")
+    parser.add_argument("--qa-data", help="Answer the questions in this qa_data.json file correctly")
+    parser.add_argument("--accuracy", type=float, help="With --script or --qa-data, answer only this fraction of scripted questions as scripted")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the answers and injected errors")
+    parser.add_argument("--no-prompt-cache", action="store_true", help="Never report cached prompt tokens")
+    parser.add_argument("--write-qa-data", metavar="PATH", help="Write a synthetic qa_data.json file for load tests and exit")
+    parser.add_argument("--questions", type=int, default=10000, help="Number of questions for --write-qa-data (default: 10000)")
+    
+    args = parser.parse_args()
+    
+    random.seed(args.seed)
+    
+    if args.write_qa_data:
+        write_synthetic_qa_data(args.write_qa_data, args.questions)
+        print(f"Wrote {args.questions} synthetic questions to {args.write_qa_data}")
+        return
+    
+    settings.update({
+        "batch_latency": args.batch_latency,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "retry_after": args.retry_after,
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "accuracy": args.accuracy,
+        "seed": args.seed,
+        "prompt_cache": not args.no_prompt_cache
+    })
+    if args.script:
+        print(f"Loaded {load_script(args.script)} scripted answers from {args.script}")
+    if args.qa_data:
+        print(f"Loaded {load_answer_key(args.qa_data)} scripted answers from {args.qa_data}")
+    
+    server = MockOpenAIServer((args.host, args.port), MockOpenAIHandler)
+    print(f"Mock OpenAI API listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
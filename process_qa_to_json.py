@@ -2,10 +2,159 @@ import os
 import json
 import re
 import argparse
+import hashlib
+import random
+import resource
+import tempfile
+import time
+import concurrent.futures
 from pathlib import Path
+from question_store import write_question_store
+
+# Questions are separated by this delimiter, wherever it appears in a line
+QUESTION_DELIMITER = '----'
+
+# Question files are read this many characters at a time
+QUESTION_READ_CHUNK = 1024 * 1024
+
+# The question text ends where this marker starts; blocks without it aren't questions
+QUESTION_END_MARKER = 'Report Content Errors'
+
+# Options are a capital letter on its own line, followed by the option text
+OPTION_PATTERN = re.compile(r'\n([A-Z])\n(.*?)(?=\n\n[A-Z]\n|\Z)', re.DOTALL)
+
+# Bump when the parsed output changes so pairs recorded in an old manifest are parsed again
+MANIFEST_VERSION = 1
+
+# Fewer pairs than this are parsed in-process; a process pool costs more to start than it saves
+PARALLEL_PARSE_MIN_PAIRS = 16
+
+def iter_question_blocks(f):
+    """
+    Split a question file into the blocks between delimiters, reading it in chunks.
+    Yields (line_number, lines) with the 1-based line each block starts on and
+    its lines without their newlines.
+    """
+    # Text after the last delimiter seen, kept as pieces until the next delimiter arrives
+    pending = []
+    # The end of the pending text, where a delimiter may start that the next chunk completes
+    tail = ''
+    line_number = 1
+    while True:
+        chunk = f.read(QUESTION_READ_CHUNK)
+        if not chunk:
+            break
+        
+        window = tail + chunk
+        if QUESTION_DELIMITER not in window:
+            pending.append(chunk)
+            tail = window[-(len(QUESTION_DELIMITER) - 1):]
+            continue
+        
+        blocks = (''.join(pending) + chunk).split(QUESTION_DELIMITER)
+        pending = [blocks.pop()]
+        tail = pending[0][-(len(QUESTION_DELIMITER) - 1):]
+        for block in blocks:
+            yield line_number, block.split('\n')
+            line_number += block.count('\n')
+    yield line_number, ''.join(pending).split('\n')
+
+def strip_block(lines):
+    """
+    Strip the lines of a block like str.strip() strips its text. Returns the
+    number of leading lines removed and the remaining lines, or None if the block is blank.
+    """
+    first = 0
+    while first < len(lines) and (not lines[first] or lines[first].isspace()):
+        first += 1
+    if first == len(lines):
+        return None
+    
+    last = len(lines) - 1
+    while not lines[last] or lines[last].isspace():
+        last -= 1
+    
+    stripped = lines[first:last + 1]
+    stripped[0] = stripped[0].lstrip()
+    stripped[-1] = stripped[-1].rstrip()
+    return first, stripped
+
+def parse_question_block(lines):
+    """
+    Parse the stripped lines of a block into a question, or None if the block has no
+    QUESTION_END_MARKER. A state machine over the lines in one pass: the question
+    text runs up to the marker; an option starts at a capital letter alone on a line
+    (but not the block's first or last line) and runs until a blank line followed
+    by the next such letter, or to the end of the block.
+    """
+    # Question text: everything before the marker
+    for marker_index, line in enumerate(lines):
+        if QUESTION_END_MARKER in line:
+            break
+    else:
+        return None
+    marker_line = lines[marker_index]
+    question_text = "\n".join(lines[:marker_index] + [marker_line[:marker_line.index(QUESTION_END_MARKER)]]).strip()
+    
+    last = len(lines) - 1
+    
+    def is_option_letter(index):
+        line = lines[index]
+        return 0 < index < last and len(line) == 1 and 'A' <= line <= 'Z'
+    
+    # Looking for the first option, which may also be before the marker
+    index = 1
+    while index < last and not is_option_letter(index):
+        index += 1
+    
+    # Reading options: index is the line of the current option's letter
+    options = {}
+    while index < last:
+        start = end = index + 1
+        while end <= last - 3 and not (lines[end + 1] == '' and is_option_letter(end + 2)):
+            end += 1
+        if end > last - 3:
+            # No next option: this one runs to the end of the block
+            end = last
+        options[lines[index]] = "\n".join(lines[start:end + 1]).strip()
+        index = end + 2
+    
+    return {
+        "question": question_text,
+        "options": options
+    }
+
+def iter_questions(file_path):
+    """
+    Yield the questions of a question file one at a time, reading it in chunks so
+    memory is bounded by the chunk size and the largest question, not the file. Blocks that
+    aren't questions are skipped with a warning giving their line number.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_number, lines in iter_question_blocks(f):
+            block = strip_block(lines)
+            if block is None:
+                continue
+            skipped, lines = block
+            line_number += skipped
+            
+            question = parse_question_block(lines)
+            if question is None:
+                print(f"Warning: {file_path}:{line_number}: block has no '{QUESTION_END_MARKER}' line, skipped")
+                continue
+            if not question["options"]:
+                print(f"Warning: {file_path}:{line_number}: question has no options")
+            yield question
 
 def parse_question_file(file_path):
     """Parse a question file and extract questions with options."""
+    return list(iter_questions(file_path))
+
+def parse_question_file_regex(file_path):
+    """
+    The original split-and-regex parser, which reads the whole file at once.
+    Kept as the reference parse_question_file is checked against (--check-parser).
+    """
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
@@ -30,8 +179,7 @@ def parse_question_file(file_path):
         
         # Extract options
         options = {}
-        option_pattern = re.compile(r'\n([A-Z])\n(.*?)(?=\n\n[A-Z]\n|\Z)', re.DOTALL)
-        option_matches = option_pattern.findall(block)
+        option_matches = OPTION_PATTERN.findall(block)
         
         for option_letter, option_text in option_matches:
             options[option_letter] = option_text.strip()
@@ -43,6 +191,67 @@ def parse_question_file(file_path):
     
     return questions
 
+def check_question_parser(file_paths):
+    """Compare parse_question_file with the original parser on each file; returns the files that differ"""
+    mismatched = []
+    for file_path in file_paths:
+        expected = parse_question_file_regex(file_path)
+        actual = parse_question_file(file_path)
+        if actual == expected:
+            continue
+        mismatched.append(file_path)
+        for number, (expected_question, actual_question) in enumerate(zip(expected, actual), 1):
+            if expected_question != actual_question:
+                print(f"Mismatch in {file_path}, question {number}:\n  expected {expected_question!r}\n  parsed   {actual_question!r}")
+                break
+        else:
+            print(f"Mismatch in {file_path}: expected {len(expected)} questions, parsed {len(actual)}")
+    return mismatched
+
+def write_synthetic_question_file(path, size_mb, seed=0):
+    """Write a question file of about size_mb megabytes, for benchmarking the parsers"""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            option_count = rng.randint(2, 6)
+            options = "\n\n".join(
+                f"{chr(ord('A') + i)}\n" + "\n".join(f"Option text {rng.random():.6f}" for _ in range(rng.randint(1, 3)))
+                for i in range(option_count)
+            )
+            block = (
+                f"Question {rng.randint(1, 10 ** 6)}: which of these statements about item {rng.random():.6f} is true?\n\n"
+                f"{QUESTION_END_MARKER}\n\n{options}\n\n{QUESTION_DELIMITER}\n\n"
+            )
+            f.write(block)
+            written += len(block)
+
+def run_question_parser(parser_name, file_path):
+    """Parse a file with one of the parsers and return (seconds, questions, peak RSS in MB); run in a fresh process"""
+    start = time.perf_counter()
+    if parser_name == 'regex':
+        count = len(parse_question_file_regex(file_path))
+    else:
+        # Consume the generator without keeping the questions, as a streaming reader would
+        count = sum(1 for _ in iter_questions(file_path))
+    seconds = time.perf_counter() - start
+    return seconds, count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark_question_parser(size_mb):
+    """Time both question parsers on a synthetic file and report throughput and peak memory"""
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'benchmark-question.md')
+        print(f"Writing a synthetic {size_mb} MB question file...")
+        write_synthetic_question_file(file_path, size_mb)
+        file_mb = os.path.getsize(file_path) / (1024 * 1024)
+        
+        for parser_name, description in (('regex', 'split and regex (original)'), ('lines', 'line-oriented streaming')):
+            # Each parser runs in its own process so their peak memory is measured separately
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                seconds, count, peak_mb = executor.submit(run_question_parser, parser_name, file_path).result()
+            print(f"{description}: {count} questions in {seconds:.2f}s, {file_mb / seconds:.1f} MB/s, peak RSS {peak_mb:.0f} MB")
+
 def parse_answer_file(file_path):
     """Parse an answer file and extract answers."""
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -84,15 +293,12 @@ def find_answer_file(directory_path, base_name):
     
     return None
 
-def process_qa_files(directory):
-    """Process all question-answer file pairs in the directory."""
-    directory_path = Path(directory)
-    
+def find_qa_pairs(directory_path):
+    """Find all question files and their answer files, as (base_name, question_file, answer_file)"""
     # Find all question files
     question_files = list(directory_path.glob('*-question.md')) + list(directory_path.glob('*_question.md'))
     
-    all_qa_data = {}
-    
+    pairs = []
     for question_file in question_files:
         # Determine the base name (without the -question suffix)
         base_name = question_file.stem
@@ -108,45 +314,150 @@ def process_qa_files(directory):
             print(f"Warning: No matching answer file found for {question_file}")
             continue
         
-        # Parse the files
-        questions = parse_question_file(question_file)
-        answers = parse_answer_file(answer_file)
-        
-        # Ensure we have the same number of questions and answers
-        if len(questions) != len(answers):
-            print(f"Warning: Mismatch in number of questions ({len(questions)}) and answers ({len(answers)}) for {base_name}")
-            # Use the minimum length to avoid index errors
-            min_length = min(len(questions), len(answers))
-            questions = questions[:min_length]
-            answers = answers[:min_length]
-        
-        # Combine questions and answers
-        qa_pairs = []
-        for i, (question, answer) in enumerate(zip(questions, answers)):
-            qa_pair = {
-                "id": f"{base_name}-{i+1}",
-                "question": question["question"],
-                "options": question["options"],
-                "correct_answer": answer
-            }
-            qa_pairs.append(qa_pair)
-        
-        all_qa_data[base_name] = qa_pairs
+        pairs.append((base_name, question_file, answer_file))
+    
+    return pairs
+
+def hash_qa_pair(question_file, answer_file):
+    """Hash the names and contents of a question file and its answer file"""
+    digest = hashlib.sha256()
+    for file_path in (question_file, answer_file):
+        digest.update(file_path.name.encode('utf-8') + b'\0')
+        with open(file_path, 'rb') as f:
+            digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def parse_qa_pair(base_name, question_file, answer_file):
+    """Parse a question file and its answer file into question-answer pairs."""
+    questions = parse_question_file(question_file)
+    answers = parse_answer_file(answer_file)
+    
+    # Ensure we have the same number of questions and answers
+    if len(questions) != len(answers):
+        print(f"Warning: Mismatch in number of questions ({len(questions)}) and answers ({len(answers)}) for {base_name}")
+        # Use the minimum length to avoid index errors
+        min_length = min(len(questions), len(answers))
+        questions = questions[:min_length]
+        answers = answers[:min_length]
+    
+    # Combine questions and answers
+    qa_pairs = []
+    for i, (question, answer) in enumerate(zip(questions, answers)):
+        qa_pair = {
+            "id": f"{base_name}-{i+1}",
+            "question": question["question"],
+            "options": question["options"],
+            "correct_answer": answer
+        }
+        qa_pairs.append(qa_pair)
+    
+    return qa_pairs
+
+def parse_qa_pairs(pairs, workers=None):
+    """Parse many question-answer file pairs, in a process pool when there are enough of them"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(pairs) < PARALLEL_PARSE_MIN_PAIRS:
+        return [parse_qa_pair(*pair) for pair in pairs]
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(pairs) // (workers * 4))
+        return list(executor.map(parse_qa_pair, *zip(*pairs), chunksize=chunksize))
+
+def load_manifest(manifest_path, output_path):
+    """
+    Load the manifest and qa data of a previous run, or empty ones if either is
+    missing or the manifest was written by another version of the parser
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(output_path, 'r', encoding='utf-8') as f:
+            qa_data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}, {}
+    
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}, {}
+    return manifest.get('files', {}), qa_data
+
+def process_qa_files(directory, previous_data=None, previous_manifest=None, workers=None):
+    """
+    Process all question-answer file pairs in the directory.
     
-    return all_qa_data
+    Pairs whose content hash matches their entry in previous_manifest are taken from
+    previous_data instead of being parsed again; the rest are parsed in a pool of
+    `workers` processes (default: one per core). Returns the qa data, its manifest
+    and the number of pairs that were parsed.
+    """
+    directory_path = Path(directory)
+    previous_data = previous_data or {}
+    previous_manifest = previous_manifest or {}
+    
+    manifest = {}
+    changed = []
+    for base_name, question_file, answer_file in find_qa_pairs(directory_path):
+        manifest[base_name] = {
+            "question_file": question_file.name,
+            "answer_file": answer_file.name,
+            "sha256": hash_qa_pair(question_file, answer_file)
+        }
+        if base_name not in previous_data or previous_manifest.get(base_name) != manifest[base_name]:
+            changed.append((base_name, question_file, answer_file))
+    
+    parsed = dict(zip([base_name for base_name, _, _ in changed], parse_qa_pairs(changed, workers)))
+    
+    # Keep the order the files were found in
+    all_qa_data = {
+        base_name: parsed[base_name] if base_name in parsed else previous_data[base_name]
+        for base_name in manifest
+    }
+    
+    return all_qa_data, manifest, len(parsed)
+
+def manifest_path_for(output_path):
+    """The manifest is kept next to the qa data file, e.g. outputs/qa_data.manifest.json"""
+    return output_path.with_name(f"{output_path.stem}.manifest.json")
+
+def store_path_for(output_path):
+    """The question store is kept next to the qa data file by default, e.g. outputs/qa_data.sqlite"""
+    return output_path.with_name(f"{output_path.stem}.sqlite")
 
 def main():
     # Set up command-line argument parsing
     parser = argparse.ArgumentParser(description='Process question and answer markdown files into JSON.')
     parser.add_argument('--input', '-i', default='questions', help='Directory containing question and answer files (default: questions)')
     parser.add_argument('--output', '-o', default='outputs/qa_data.json', help='Output JSON file path (default: outputs/qa_data.json)')
+    parser.add_argument('--workers', type=int, help='Processes used to parse files (default: one per core)')
+    parser.add_argument('--rebuild', action='store_true', help='Parse every file again instead of only the changed ones')
+    parser.add_argument('--store', help='Indexed SQLite question store to write for --qa-data (default: next to --output, e.g. outputs/qa_data.sqlite)')
+    parser.add_argument('--no-store', action='store_true', help='Only write the JSON file, not the question store')
+    parser.add_argument('--check-parser', action='store_true',
+                        help='Check that the streaming parser matches the original one on every question file in --input, and exit')
+    parser.add_argument('--benchmark-parser', type=int, metavar='MB',
+                        help='Compare the throughput and memory of both parsers on a synthetic file of this size, and exit')
     args = parser.parse_args()
     
+    if args.benchmark_parser:
+        benchmark_question_parser(args.benchmark_parser)
+        return
+    
+    if args.check_parser:
+        question_files = [question_file for _, question_file, _ in find_qa_pairs(Path(args.input))]
+        mismatched = check_question_parser(question_files)
+        print(f"Checked {len(question_files)} question files: {len(mismatched)} differ from the original parser")
+        raise SystemExit(1 if mismatched else 0)
+    
+    output_path = Path(args.output)
+    manifest_path = manifest_path_for(output_path)
+    
+    # Only pairs that changed since the last run are parsed again
+    previous_manifest, previous_data = ({}, {}) if args.rebuild else load_manifest(manifest_path, output_path)
+    
     # Process the files
-    qa_data = process_qa_files(args.input)
+    qa_data, manifest, parsed = process_qa_files(args.input, previous_data, previous_manifest, args.workers)
     
     # Create output directory if it doesn't exist
-    output_path = Path(args.output)
     output_dir = output_path.parent
     output_dir.mkdir(exist_ok=True, parents=True)
     
@@ -154,6 +465,19 @@ def main():
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(qa_data, f, indent=2)
     
+    # The question store keeps each test's hash, so only changed tests are rewritten
+    if not args.no_store:
+        store_path = Path(args.store) if args.store else store_path_for(output_path)
+        if args.rebuild and store_path.exists():
+            store_path.unlink()
+        written = write_question_store(str(store_path), qa_data, {base_name: entry["sha256"] for base_name, entry in manifest.items()})
+        print(f"Question store {store_path}: rewrote {written} of {len(qa_data)} tests")
+    
+    # Written after the data, so an interrupted run can't leave a manifest describing data that wasn't saved
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": manifest}, f, indent=2)
+    
+    print(f"Parsed {parsed} new or changed question files, reused {len(manifest) - parsed}")
     print(f"Processed {sum(len(qa_pairs) for qa_pairs in qa_data.values())} questions from {len(qa_data)} files")
     print(f"Output saved to {output_path}")
 
@@ -0,0 +1,194 @@
+"""
+An indexed question bank in SQLite, written by process_qa_to_json.py and read by
+generate_comprehensive_report.py instead of parsing the whole qa_data.json.
+
+Questions are keyed by test id and position, with an index on question id, so
+single questions, single tests and samples are read without loading the rest of
+the bank. Each test's content hash is stored too, so only changed tests are rewritten.
+"""
+
+import bisect
+import json
+import os
+import random
+import sqlite3
+
+# Bump when the schema changes; stores written by another version are rebuilt
+STORE_VERSION = 1
+
+# Every SQLite database file starts with this header
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+def is_question_store(path):
+    """Whether a file is a SQLite question store rather than a qa_data.json file"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+def create_schema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS tests ("
+        "test_id TEXT PRIMARY KEY, ordinal INTEGER NOT NULL, question_count INTEGER NOT NULL, sha256 TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS questions ("
+        "test_id TEXT NOT NULL, position INTEGER NOT NULL, id TEXT, question TEXT, options TEXT, correct_answer TEXT, "
+        "PRIMARY KEY (test_id, position)) WITHOUT ROWID"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS questions_by_id ON questions (id)")
+
+def write_question_store(path, qa_data, hashes=None):
+    """
+    Write qa_data (test id -> list of questions, as in qa_data.json) to a question
+    store. With hashes (test id -> content hash), tests whose stored hash matches
+    are left as they are; otherwise every test is rewritten. Tests not in qa_data
+    are removed. Returns the number of tests written.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        version = None
+        if conn.execute("SELECT name FROM sqlite_master WHERE name = 'settings'").fetchone():
+            version = conn.execute("SELECT value FROM settings WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != STORE_VERSION:
+            conn.execute("DROP TABLE IF EXISTS questions")
+            conn.execute("DROP TABLE IF EXISTS tests")
+            create_schema(conn)
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('version', ?)", (str(STORE_VERSION),))
+        
+        stored = dict(conn.execute("SELECT test_id, sha256 FROM tests"))
+        written = 0
+        with conn:
+            for test_id in set(stored) - set(qa_data):
+                conn.execute("DELETE FROM questions WHERE test_id = ?", (test_id,))
+            conn.execute("DELETE FROM tests")
+            
+            for ordinal, (test_id, test_questions) in enumerate(qa_data.items()):
+                sha256 = hashes.get(test_id) if hashes else None
+                if sha256 is None or stored.get(test_id) != sha256:
+                    conn.execute("DELETE FROM questions WHERE test_id = ?", (test_id,))
+                    conn.executemany(
+                        "INSERT INTO questions (test_id, position, id, question, options, correct_answer) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (test_id, position, question.get("id", ""), question.get("question", ""),
+                             json.dumps(question.get("options", {})), json.dumps(question.get("correct_answer", [])))
+                            for position, question in enumerate(test_questions)
+                        ]
+                    )
+                    written += 1
+                conn.execute(
+                    "INSERT INTO tests (test_id, ordinal, question_count, sha256) VALUES (?, ?, ?, ?)",
+                    (test_id, ordinal, len(test_questions), sha256)
+                )
+        return written
+    finally:
+        conn.close()
+
+def proportional_allocation(counts, n):
+    """Split n draws between strata in proportion to their sizes, by largest remainder"""
+    total = sum(counts)
+    if n >= total:
+        return list(counts)
+    quotas = [count * n / total for count in counts]
+    allocation = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(counts)), key=lambda stratum: quotas[stratum] - allocation[stratum], reverse=True)
+    for stratum in by_remainder[:n - sum(allocation)]:
+        allocation[stratum] += 1
+    return allocation
+
+def stratified_order(counts, n, rng):
+    """
+    Draw n (stratum, position) pairs without replacement, in proportion to the
+    strata sizes, and interleave them at random so every prefix of the order is
+    also close to proportional
+    """
+    keyed = []
+    for stratum, (count, draws) in enumerate(zip(counts, proportional_allocation(counts, n))):
+        offset = rng.random()
+        for rank, position in enumerate(rng.sample(range(count), draws)):
+            keyed.append(((rank + offset) / draws, stratum, position))
+    keyed.sort()
+    return [(stratum, position) for _, stratum, position in keyed]
+
+def random_order(counts, n, rng):
+    """Draw n (stratum, position) pairs uniformly without replacement, in random order"""
+    starts = [0]
+    for count in counts:
+        starts.append(starts[-1] + count)
+    picks = []
+    for index in rng.sample(range(starts[-1]), min(n, starts[-1])):
+        stratum = bisect.bisect_right(starts, index) - 1
+        picks.append((stratum, index - starts[stratum]))
+    return picks
+
+def sample_positions(counts, n, seed=0, strategy="stratified"):
+    """Seeded sample of n (stratum, position) pairs: 'stratified' across strata, or 'random'"""
+    rng = random.Random(seed)
+    if strategy == "stratified":
+        return stratified_order(counts, n, rng)
+    return random_order(counts, n, rng)
+
+class QuestionStore:
+    """Read-only access to a question store written by write_question_store"""
+    
+    def __init__(self, path):
+        if not is_question_store(path):
+            raise ValueError(f"{path} is not a question store")
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        version = self.conn.execute("SELECT value FROM settings WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != STORE_VERSION:
+            raise ValueError(f"{path} was written by another version of process_qa_to_json.py; run it again")
+    
+    def test_counts(self, test_id=None):
+        """(test id, question count) for every test in bank order, or only the given test"""
+        if test_id is not None:
+            return self.conn.execute("SELECT test_id, question_count FROM tests WHERE test_id = ?", (test_id,)).fetchall()
+        return self.conn.execute("SELECT test_id, question_count FROM tests ORDER BY ordinal").fetchall()
+    
+    def row_to_question(self, row):
+        question_id, question, options, correct_answer = row
+        return {
+            "id": question_id,
+            "question": question,
+            "options": json.loads(options),
+            "correct_answer": json.loads(correct_answer)
+        }
+    
+    def get(self, question_id, test_id=None):
+        """Look up a question by id (and test id, if ids repeat between tests), or None"""
+        query = "SELECT id, question, options, correct_answer FROM questions WHERE id = ?"
+        params = (question_id,)
+        if test_id is not None:
+            query += " AND test_id = ?"
+            params += (test_id,)
+        row = self.conn.execute(query, params).fetchone()
+        return self.row_to_question(row) if row else None
+    
+    def get_at(self, test_id, position):
+        """The question at a position in a test, or None"""
+        row = self.conn.execute(
+            "SELECT id, question, options, correct_answer FROM questions WHERE test_id = ? AND position = ?",
+            (test_id, position)
+        ).fetchone()
+        return self.row_to_question(row) if row else None
+    
+    def iter_questions(self, test_id=None):
+        """Yield (test id, question) for one test or the whole bank in order, reading them as they are consumed"""
+        for test, _ in self.test_counts(test_id):
+            cursor = self.conn.execute(
+                "SELECT id, question, options, correct_answer FROM questions WHERE test_id = ? ORDER BY position", (test,)
+            )
+            for row in cursor:
+                yield test, self.row_to_question(row)
+    
+    def sample(self, n, seed=0, strategy="stratified", test_id=None):
+        """A seeded sample of n (test id, question) pairs from one test or the whole bank (see sample_positions)"""
+        tests = self.test_counts(test_id)
+        positions = sample_positions([count for _, count in tests], n, seed, strategy)
+        return [(tests[stratum][0], self.get_at(tests[stratum][0], position)) for stratum, position in positions]
+    
+    def close(self):
+        self.conn.close()
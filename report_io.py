@@ -0,0 +1,189 @@
+"""
+Reading and writing report files, shared by generate_comprehensive_report.py and
+summarize_llm_results.py: optional gzip/zstd compression and the compact response schema.
+"""
+
+import gzip
+import json
+import os
+import re
+
+# File suffixes for each compression option
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Report files are JSON or JSONL, optionally compressed
+REPORT_EXTENSIONS = (".json", ".jsonl")
+
+# Reports are read in chunks of this many characters when only the metadata is needed
+METADATA_READ_CHUNK = 64 * 1024
+
+# JSON reports written by generate_comprehensive_report start with their metadata
+LEADING_METADATA_PATTERN = re.compile(r'\s*\{\s*"metadata"\s*:\s*')
+
+# JSONL records are written with "type" as their first key
+JSONL_METADATA_PREFIXES = ('{"type": "header"', '{"type": "trailer"')
+
+def compression_of(path):
+    """Return the compression used by a file, judged by its suffix, or None"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+def strip_compression_suffix(path):
+    """Return the path without its compression suffix"""
+    compression = compression_of(path)
+    return path[:-len(COMPRESSION_SUFFIXES[compression])] if compression else path
+
+def is_report_file(path):
+    """Whether a path looks like a report: .json or .jsonl, optionally compressed"""
+    return strip_compression_suffix(path).endswith(REPORT_EXTENSIONS)
+
+def is_jsonl_report(path):
+    """Whether a report path is in the JSONL format"""
+    return strip_compression_suffix(path).endswith(".jsonl")
+
+def open_report_file(path, mode="r"):
+    """Open a report for reading or writing text, compressing or decompressing by its suffix"""
+    compression = compression_of(path)
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compressed reports need the zstandard package: pip install zstandard")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode)
+
+def read_leading_metadata(f):
+    """
+    Decode only the "metadata" object at the start of a JSON report, reading no
+    further than its end. Returns None if the file doesn't start with metadata.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        chunk = f.read(METADATA_READ_CHUNK)
+        buffer += chunk
+        match = LEADING_METADATA_PATTERN.match(buffer)
+        if match is None:
+            # Keep reading only while the buffer could still be the start of the pattern
+            if len(buffer.lstrip()) > len('{ "metadata" :') or not chunk:
+                return None
+            continue
+        try:
+            metadata, _ = decoder.raw_decode(buffer, match.end())
+            return metadata
+        except json.JSONDecodeError:
+            if not chunk:
+                return None
+
+def read_jsonl_tail_metadata(path):
+    """
+    Return the metadata from the trailer on the last line of an uncompressed JSONL
+    report, reading only the end of the file, or None if the report has no trailer
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        block = METADATA_READ_CHUNK
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            data = f.read(size - start)
+            lines = data.rstrip().split(b"\n")
+            # The last line is complete once a newline precedes it, or the whole file is read
+            if len(lines) > 1 or start == 0:
+                break
+            block *= 2
+    
+    last_line = lines[-1].decode("utf-8", errors="replace")
+    if not last_line.startswith(JSONL_METADATA_PREFIXES[1]):
+        return None
+    try:
+        return json.loads(last_line)["metadata"]
+    except (json.JSONDecodeError, KeyError):
+        return None
+
+def read_report_metadata(path):
+    """
+    Return the metadata of a report in any format without parsing its responses.
+    JSONL reports keep the final metadata in their trailer, or only the header's if
+    the run was interrupted.
+    """
+    if not is_jsonl_report(path):
+        with open_report_file(path) as f:
+            metadata = read_leading_metadata(f)
+        if metadata is not None:
+            return metadata
+        # Reports laid out some other way need a full parse
+        with open_report_file(path) as f:
+            data = json.load(f)
+        return data.get("metadata") if isinstance(data, dict) else None
+    
+    if compression_of(path) is None:
+        metadata = read_jsonl_tail_metadata(path)
+        if metadata is not None:
+            return metadata
+    
+    # Compressed or interrupted JSONL: scan the lines, decoding only header and trailer records
+    metadata = None
+    with open_report_file(path) as f:
+        try:
+            for line in f:
+                if not line.startswith(JSONL_METADATA_PREFIXES):
+                    continue
+                try:
+                    metadata = json.loads(line)["metadata"]
+                except json.JSONDecodeError:
+                    continue
+        except EOFError:
+            # A compressed report from a crashed run ends without its end-of-stream marker
+            pass
+    return metadata
+
+def iter_report_responses(path):
+    """Yield the response entries of a report in any format, full or compact"""
+    if not is_jsonl_report(path):
+        with open_report_file(path) as f:
+            data = json.load(f)
+        yield from data.get("responses", []) if isinstance(data, dict) else []
+        return
+    
+    with open_report_file(path) as f:
+        try:
+            for line in f:
+                if not line.startswith('{"type": "response"'):
+                    continue
+                try:
+                    yield json.loads(line)["response"]
+                except json.JSONDecodeError:
+                    # The last line of an interrupted run may be cut short
+                    continue
+        except EOFError:
+            pass
+
+def compact_response(response):
+    """
+    Shrink a report entry: the question is referred to by id only, the options are
+    not repeated, and only the content, finish_reason and usage of the API response are kept
+    """
+    completion = response.get("response")
+    if completion is not None and "choices" in completion:
+        choice = completion["choices"][0]
+        completion = {
+            "content": choice["message"]["content"],
+            "finish_reason": choice["finish_reason"],
+            "usage": completion.get("usage")
+        }
+    
+    compact = {key: value for key, value in response.items() if key != "question"}
+    compact["response"] = completion
+    compact["evaluation"] = {key: value for key, value in response["evaluation"].items() if key != "options"}
+    return compact
+
+def report_path_with_compression(path, compression):
+    """Add the compression suffix to a report path if it doesn't have one"""
+    if compression is None or compression_of(path) == compression:
+        return path
+    return path + COMPRESSION_SUFFIXES[compression]
@@ -1,8 +1,35 @@
 import json
 import os
+import sqlite3
+import warnings
 import argparse
+import concurrent.futures
 from tabulate import tabulate
+import numpy as np
 import pandas as pd
+from latency_stats import merge_histograms, summarize_histogram
+from report_io import is_report_file, iter_report_responses, read_report_metadata
+
+# Default results index file name, kept in the summarized directory
+INDEX_FILE_NAME = '.results_index.sqlite'
+
+# Bump when extract_metadata's output changes so old index rows are re-parsed
+INDEX_VERSION = 4
+
+# Fewer files than this are parsed in-process; a process pool costs more to start than it saves
+PARALLEL_PARSE_MIN_FILES = 16
+
+# Confidence interval columns in the model averages and how their bounds are shown
+CONFIDENCE_INTERVAL_FORMATS = {
+    'accuracy_ci': '{:.2%}',
+    'cost_per_question_ci': '{:.6f}',
+    'mean_latency_ci': '{:.3f}',
+    'p50_latency_ci': '{:.3f}',
+    'p95_latency_ci': '{:.3f}'
+}
+
+# Bootstrap resamples drawn per NumPy batch; bounds memory to BOOTSTRAP_BATCH x distinct questions values
+BOOTSTRAP_BATCH = 100
 
 def load_json_file(file_path):
     """Load and parse a JSON file."""
@@ -10,19 +37,26 @@ def load_json_file(file_path):
         return json.load(f)
 
 def find_json_files(directory):
-    """Find all JSON files in a directory and its subdirectories."""
+    """
+    Find all report files (JSON or JSONL, optionally compressed) in a directory and its subdirectories.
+    Hidden directories such as the response cache (outputs/.response_cache) are skipped.
+    """
     json_files = []
-    for root, _, files in os.walk(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
         for file in files:
-            if file.endswith('.json') and file != 'qa_data.json':
+            if is_report_file(file) and file != 'qa_data.json' and not file.endswith('_batch_input.jsonl'):
                 json_files.append(os.path.join(root, file))
     return json_files
 
 def extract_metadata(json_file):
     """Extract relevant metadata from a JSON file."""
     try:
-        data = load_json_file(json_file)
-        metadata = data.get('metadata', {})
+        # Reads full and compact reports, JSON or JSONL, compressed or not
+        metadata = read_report_metadata(json_file)
+        if metadata is None:
+            # Not a report, e.g. a summary or trace file
+            return None
         
         # Extract the test name from questions_file
         questions_file = metadata.get('questions_file', '')
@@ -37,6 +71,7 @@ def extract_metadata(json_file):
         # Extract other metadata
         result = {
             'file': os.path.basename(json_file),
+            'path': json_file,
             'test_name': test_name,
             'model': model_name,
             'total_questions': metadata.get('total_questions', 0),
@@ -44,20 +79,248 @@ def extract_metadata(json_file):
             'total_incorrect': metadata.get('total_incorrect', 'N/A'),
             'accuracy': metadata.get('accuracy', 'N/A'),
             'total_duration_seconds': metadata.get('total_duration_seconds', 0),
-            'total_cost': metadata.get('costs', {}).get('total_cost', 0)
+            'total_cost': metadata.get('costs', {}).get('total_cost', 0),
+            'wall_clock_seconds': metadata.get('wall_clock_seconds'),
+            'questions_per_second': metadata.get('questions_per_second')
         }
         
+        # Latency percentiles; reports from before latency histograms don't have them
+        latency = metadata.get('latency', {})
+        for percentile in ('p50', 'p90', 'p95', 'p99', 'max'):
+            result[f'{percentile}_seconds'] = latency.get(f'{percentile}_seconds')
+        result['latency_histogram'] = latency.get('histogram')
+        
+        # Prompt caching; reports from before cached-token pricing don't have it
+        prompt_cache = metadata.get('prompt_cache', {})
+        result['prompt_tokens'] = prompt_cache.get('prompt_tokens')
+        result['cached_tokens'] = prompt_cache.get('cached_tokens')
+        result['cache_responses'] = prompt_cache.get('responses')
+        result['cache_hits'] = prompt_cache.get('responses_with_cached_tokens')
+        result['cache_hit_rate'] = prompt_cache.get('hit_rate')
+        result['cached_token_rate'] = prompt_cache.get('cached_token_rate')
+        result['cache_savings'] = metadata.get('costs', {}).get('total_cache_savings')
+        
         # Format accuracy as percentage if it exists
         if result['accuracy'] != 'N/A':
             result['accuracy_formatted'] = f"{result['accuracy']:.2%}"
         else:
             result['accuracy_formatted'] = 'N/A'
-            
+        
         return result
     except Exception as e:
         print(f"Error processing {json_file}: {e}")
         return None
 
+def extract_outcomes(json_file):
+    """
+    Extract the per-question outcomes of a report for bootstrapping: each question's
+    id, whether it was answered correctly, its cost, and the latency of its API call
+    (None when it made no timed call).
+    """
+    try:
+        outcomes = {'id': [], 'correct': [], 'cost': [], 'latency': []}
+        for response in iter_report_responses(json_file):
+            status = response.get('evaluation', {}).get('status')
+            timing = response.get('timing') or {}
+            outcomes['id'].append(response.get('id', ''))
+            outcomes['correct'].append(1 if status == 'correct' else 0)
+            outcomes['cost'].append((response.get('costs') or {}).get('total_cost', 0))
+            
+            # Same latencies as the report's percentiles: cache hits, batch results and errors made no timed call
+            timed = status != 'error' and not timing.get('cache_hit') and 'batch_id' not in timing
+            outcomes['latency'].append(timing.get('duration_seconds', 0) if timed else None)
+        return outcomes
+    except Exception as e:
+        print(f"Error reading responses from {json_file}: {e}")
+        return None
+
+def extract_all(extractor, json_files, workers=None):
+    """
+    Run an extractor over many files, in a process pool when there are enough of them.
+    Returns one result per file, in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(json_files) < PARALLEL_PARSE_MIN_FILES:
+        return [extractor(file_path) for file_path in json_files]
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(json_files) // (workers * 4))
+        return list(executor.map(extractor, json_files, chunksize=chunksize))
+
+def extract_all_metadata(json_files, workers=None):
+    """Extract metadata from many files, with None for files that aren't reports"""
+    return extract_all(extract_metadata, json_files, workers)
+
+class ResultsIndex:
+    """
+    Persistent SQLite index of report metadata keyed by path, mtime and size.
+    Only new or changed reports are parsed on refresh; files that are not reports
+    are remembered too, so they aren't parsed again either.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS reports ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, row TEXT)'
+        )
+        # Per-question outcomes are only parsed when confidence intervals are asked for
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS outcomes ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, data TEXT)'
+        )
+        
+        # Rows extracted by another version of extract_metadata can't be reused
+        version = self.conn.execute("SELECT value FROM settings WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != INDEX_VERSION:
+            self.clear()
+            self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('version', ?)", (str(INDEX_VERSION),))
+            self.conn.commit()
+    
+    def clear(self):
+        self.conn.execute('DELETE FROM reports')
+        self.conn.execute('DELETE FROM outcomes')
+        self.conn.commit()
+    
+    def changed_files(self, table, json_files):
+        """Return (path, mtime_ns, size) for files whose entry in a table is missing or stale, and the indexed paths"""
+        indexed = {path: (mtime_ns, size) for path, mtime_ns, size in self.conn.execute(f'SELECT path, mtime_ns, size FROM {table}')}
+        
+        changed = []
+        for file_path in json_files:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if indexed.get(file_path) != (stat.st_mtime_ns, stat.st_size):
+                changed.append((file_path, stat.st_mtime_ns, stat.st_size))
+        return changed, indexed
+    
+    def refresh(self, json_files, workers=None):
+        """Parse new and changed reports, drop removed ones, and return (parsed, removed) counts"""
+        changed, indexed = self.changed_files('reports', json_files)
+        
+        rows = extract_all_metadata([file_path for file_path, _, _ in changed], workers)
+        upserts = [
+            (file_path, mtime_ns, size, json.dumps(row) if row else None)
+            for (file_path, mtime_ns, size), row in zip(changed, rows)
+        ]
+        
+        removed = [(path,) for path in set(indexed) - set(json_files)]
+        
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO reports (path, mtime_ns, size, row) VALUES (?, ?, ?, ?)', upserts)
+            self.conn.executemany('DELETE FROM reports WHERE path = ?', removed)
+            self.conn.executemany('DELETE FROM outcomes WHERE path = ?', removed)
+        return len(upserts), len(removed)
+    
+    def outcomes(self, json_files, workers=None):
+        """Per-question outcomes of the given reports by path, parsing only new or changed ones"""
+        changed, _ = self.changed_files('outcomes', json_files)
+        parsed = extract_all(extract_outcomes, [file_path for file_path, _, _ in changed], workers)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO outcomes (path, mtime_ns, size, data) VALUES (?, ?, ?, ?)',
+                [(file_path, mtime_ns, size, json.dumps(data) if data else None)
+                 for (file_path, mtime_ns, size), data in zip(changed, parsed)]
+            )
+        
+        wanted = set(json_files)
+        return {
+            path: json.loads(data)
+            for path, data in self.conn.execute('SELECT path, data FROM outcomes WHERE data IS NOT NULL')
+            if path in wanted
+        }
+    
+    def rows(self):
+        """The extracted metadata of every indexed report"""
+        return [json.loads(row) for (row,) in self.conn.execute('SELECT row FROM reports WHERE row IS NOT NULL ORDER BY path')]
+    
+    def close(self):
+        self.conn.close()
+
+def bootstrap_weights(clusters, resamples, rng):
+    """
+    Draw `resamples` bootstrap resamples of `clusters` clusters with replacement and
+    return how many times each cluster was drawn, as a (resamples, clusters) array
+    """
+    indices = rng.integers(0, clusters, size=(resamples, clusters)) + np.arange(resamples)[:, None] * clusters
+    return np.bincount(indices.ravel(), minlength=resamples * clusters).reshape(resamples, clusters)
+
+def bootstrap_confidence_intervals(runs, resamples, confidence, rng):
+    """
+    Cluster bootstrap confidence intervals from the per-question outcomes of a
+    model's runs. Question ids are resampled, and every run's outcomes for a drawn
+    question come with it, so repeated runs of the same questions don't count as
+    independent evidence.
+    
+    Accuracy and cost per question are the mean of the per-run values, like
+    avg_accuracy; latency is pooled over all runs' API calls, like the merged
+    histogram percentiles. Returns the point estimates and interval bounds.
+    """
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    
+    # Map each run's questions to shared cluster numbers
+    clusters = {}
+    run_clusters = [np.array([clusters.setdefault(question_id, len(clusters)) for question_id in run['id']], dtype=np.int64)
+                    for run in runs]
+    if not clusters:
+        return {}
+    correct = [np.asarray(run['correct'], dtype=float) for run in runs]
+    cost = [np.asarray(run['cost'], dtype=float) for run in runs]
+    
+    # Timed latencies of all runs, sorted once so percentiles are read off cumulative weights
+    latency = np.array([value for run in runs for value in run['latency'] if value is not None], dtype=float)
+    latency_clusters = np.concatenate([
+        run_cluster[[value is not None for value in run['latency']]] for run, run_cluster in zip(runs, run_clusters)
+    ]) if len(latency) else np.array([], dtype=np.int64)
+    order = np.argsort(latency, kind='stable')
+    latency, latency_clusters = latency[order], latency_clusters[order]
+    
+    def statistics(weights):
+        # Per-run means over the drawn questions, then averaged over runs
+        run_means = []
+        for run_cluster, run_correct, run_cost in zip(run_clusters, correct, cost):
+            run_weights = weights[:, run_cluster]
+            drawn = run_weights.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                run_means.append(np.column_stack([run_weights @ run_correct, run_weights @ run_cost]) / drawn[:, None])
+        with warnings.catch_warnings():
+            # A resample can miss all of a run's questions; that run is left out of its mean
+            warnings.simplefilter('ignore', RuntimeWarning)
+            columns = [np.nanmean(np.stack(run_means), axis=0)]
+        
+        if len(latency):
+            latency_weights = weights[:, latency_clusters]
+            cumulative = np.cumsum(latency_weights, axis=1)
+            total = cumulative[:, -1]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = latency_weights @ latency / total
+            # Nearest-rank percentiles, as in the reports
+            percentiles = [latency[np.argmax(cumulative >= share * total[:, None], axis=1)] for share in (0.5, 0.95)]
+            columns.append(np.column_stack([mean, *percentiles]))
+        return np.column_stack(columns)
+    
+    estimate = statistics(np.ones((1, len(clusters)), dtype=np.int64))[0]
+    estimates = np.concatenate([
+        statistics(bootstrap_weights(len(clusters), min(BOOTSTRAP_BATCH, resamples - start), rng))
+        for start in range(0, resamples, BOOTSTRAP_BATCH)
+    ])
+    
+    names = ['accuracy', 'cost_per_question']
+    if len(latency):
+        names += ['mean_latency', 'p50_latency', 'p95_latency']
+    result = {'cost_per_question': float(estimate[1])}
+    if len(latency):
+        result['mean_latency_seconds'] = float(estimate[2])
+    for column, name in enumerate(names):
+        low, high = np.nanquantile(estimates[:, column], quantiles)
+        result[f'{name}_ci_low'] = float(low)
+        result[f'{name}_ci_high'] = float(high)
+    return result
+
 def save_results_as_json(results_data, model_averages, output_file):
     """Save the results and model averages as JSON."""
     # Create directory if it doesn't exist
@@ -79,8 +342,31 @@ def save_results_as_json(results_data, model_averages, output_file):
     
     print(f"\nResults saved to {output_file}")
 
-def summarize_results(directory, json_output=None, print_output=True):
-    """Summarize results from all JSON files in the directory."""
+def load_outcomes(directory, json_files, index_path=None, workers=None):
+    """Per-question outcomes of the given reports by path, through the results index unless index_path is False"""
+    if index_path is False:
+        return {path: data for path, data in zip(json_files, extract_all(extract_outcomes, json_files, workers)) if data}
+    
+    index = ResultsIndex(index_path or os.path.join(directory, INDEX_FILE_NAME))
+    try:
+        return index.outcomes(json_files, workers)
+    finally:
+        index.close()
+
+def summarize_results(directory, json_output=None, print_output=True, index_path=None, rebuild_index=False, workers=None,
+                      bootstrap=0, confidence=0.95, seed=0):
+    """
+    Summarize results from all JSON files in the directory.
+    
+    Report metadata is kept in a SQLite index (index_path, by default inside the
+    directory) so only new or changed reports are parsed. Pass index_path=False to
+    parse every report without an index. Reports are parsed in a pool of `workers`
+    processes (default: one per core).
+    
+    With `bootstrap` resamples, the model averages include bootstrap confidence
+    intervals for accuracy, cost per question and latency. These need every report's
+    responses, which are parsed once and then kept in the index too.
+    """
     json_files = find_json_files(directory)
     
     if not json_files:
@@ -90,12 +376,20 @@ def summarize_results(directory, json_output=None, print_output=True):
     if print_output:
         print(f"Found {len(json_files)} JSON files to summarize")
     
-    # Extract metadata from each file
-    results = []
-    for file_path in json_files:
-        metadata = extract_metadata(file_path)
-        if metadata:
-            results.append(metadata)
+    if index_path is False:
+        # Extract metadata from each file
+        results = [metadata for metadata in extract_all_metadata(json_files, workers) if metadata]
+    else:
+        index = ResultsIndex(index_path or os.path.join(directory, INDEX_FILE_NAME))
+        try:
+            if rebuild_index:
+                index.clear()
+            parsed, removed = index.refresh(json_files, workers)
+            if print_output:
+                print(f"Results index {index.path}: parsed {parsed} new or changed files, dropped {removed} removed files")
+            results = index.rows()
+        finally:
+            index.close()
     
     if not results:
         print("No valid metadata found in any files")
@@ -113,6 +407,11 @@ def summarize_results(directory, json_output=None, print_output=True):
             lambda x: f"{float(x):.2%}" if isinstance(x, (int, float)) or (isinstance(x, str) and x.replace('.', '', 1).isdigit()) else 'N/A'
         )
     
+    # Cache rates as percentages; runs without prompt cache figures show N/A
+    for column in ('cache_hit_rate', 'cached_token_rate'):
+        if column in df.columns:
+            df[f'{column}_formatted'] = df[column].map(lambda x: 'N/A' if pd.isna(x) else f"{x:.2%}")
+    
     # Define desired display columns
     desired_columns = [
         'test_name', 
@@ -121,7 +420,13 @@ def summarize_results(directory, json_output=None, print_output=True):
         'total_correct', 
         'total_incorrect', 
         'accuracy_formatted', 
-        'total_duration_seconds', 
+        'wall_clock_seconds', 
+        'questions_per_second', 
+        'p50_seconds', 
+        'p95_seconds', 
+        'p99_seconds', 
+        'cache_hit_rate_formatted', 
+        'cached_token_rate_formatted', 
         'total_cost'
     ]
     
@@ -139,40 +444,80 @@ def summarize_results(directory, json_output=None, print_output=True):
     print("\nSummary of LLM Results:")
     print(tabulate(display_df[display_columns], headers='keys', tablefmt='grid', showindex=False))
     
-    # Calculate and display averages by model
+    # Calculate and display averages by model in one groupby pass
     print("\nAverages by Model:")
-    numeric_columns = ['total_questions', 'total_duration_seconds', 'total_cost']
-    available_numeric_columns = [col for col in numeric_columns if col in df.columns]
+    df['accuracy_value'] = pd.to_numeric(df['accuracy'], errors='coerce')
     
-    if available_numeric_columns:
-        model_avg = df.groupby('model')[available_numeric_columns].mean().reset_index()
-    else:
-        model_avg = df.groupby('model').size().reset_index(name='count')
+    # Throughput over every run with a recorded wall-clock time
+    wall_clock = pd.to_numeric(df['wall_clock_seconds'], errors='coerce')
+    questions_per_second = pd.to_numeric(df['questions_per_second'], errors='coerce')
+    timed = wall_clock.notna() & questions_per_second.notna()
+    df['timed_seconds'] = wall_clock.where(timed, 0)
+    df['timed_questions'] = (questions_per_second * wall_clock).where(timed, 0)
     
-    # Add accuracy calculation for models that have it
-    if 'accuracy' in df.columns:
-        accuracy_data = []
-        for model in model_avg['model']:
-            model_files = df[df['model'] == model]
-            # Use the original accuracy values for calculation
-            accuracies = [float(acc) for acc in model_files['accuracy'] 
-                         if isinstance(acc, (int, float)) or 
-                         (isinstance(acc, str) and acc.replace('.', '', 1).isdigit())]
-            if accuracies:
-                avg_accuracy = sum(accuracies) / len(accuracies)
-                accuracy_data.append((model, avg_accuracy, f"{avg_accuracy:.2%}"))
+    # Cache rates are pooled over every response, not averaged over runs
+    for column in ('prompt_tokens', 'cached_tokens', 'cache_responses', 'cache_hits', 'cache_savings'):
+        if column not in df.columns:
+            df[column] = None
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    
+    # Latency histograms are merged, since percentiles can't be averaged across runs
+    model_avg = df.groupby('model').agg(
+        total_questions=('total_questions', 'mean'),
+        total_duration_seconds=('total_duration_seconds', 'mean'),
+        total_cost=('total_cost', 'mean'),
+        avg_accuracy=('accuracy_value', 'mean'),
+        timed_questions=('timed_questions', 'sum'),
+        timed_seconds=('timed_seconds', 'sum'),
+        prompt_tokens=('prompt_tokens', 'sum'),
+        cached_tokens=('cached_tokens', 'sum'),
+        cache_responses=('cache_responses', 'sum'),
+        cache_hits=('cache_hits', 'sum'),
+        cache_savings=('cache_savings', 'mean'),
+        latency_histogram=('latency_histogram', merge_histograms)
+    ).reset_index()
+    df = df.drop(columns=['accuracy_value', 'timed_seconds', 'timed_questions'])
+    
+    model_avg['avg_accuracy_formatted'] = model_avg['avg_accuracy'].map(lambda x: 'N/A' if pd.isna(x) else f"{x:.2%}")
+    model_avg['questions_per_second'] = (model_avg['timed_questions'] / model_avg['timed_seconds']).where(model_avg['timed_seconds'] > 0)
+    latency = pd.DataFrame([summarize_histogram(histogram) for histogram in model_avg['latency_histogram']])
+    for column in ('p50_seconds', 'p90_seconds', 'p95_seconds', 'p99_seconds', 'max_seconds'):
+        model_avg[column] = latency[column]
+    model_avg['cache_hit_rate'] = (model_avg['cache_hits'] / model_avg['cache_responses']).where(model_avg['cache_responses'] > 0)
+    model_avg['cached_token_rate'] = (model_avg['cached_tokens'] / model_avg['prompt_tokens']).where(model_avg['prompt_tokens'] > 0)
+    model_avg = model_avg.drop(columns=['timed_questions', 'timed_seconds', 'latency_histogram',
+                                        'prompt_tokens', 'cached_tokens', 'cache_responses', 'cache_hits'])
+    
+    # Bootstrap confidence intervals from the per-question outcomes of each model's runs
+    display_avg = model_avg.copy()
+    if bootstrap:
+        outcomes = load_outcomes(directory, list(df['path']), index_path, workers)
+        rng = np.random.default_rng(seed)
+        intervals = []
+        for model, paths in df.groupby('model')['path']:
+            runs = [outcomes[path] for path in paths if path in outcomes]
+            intervals.append({'model': model, **bootstrap_confidence_intervals(runs, bootstrap, confidence, rng)})
+        model_avg = model_avg.merge(pd.DataFrame(intervals), on='model', how='left')
         
-        # Add accuracy column to model_avg if we have data
-        if accuracy_data:
-            accuracy_df = pd.DataFrame(accuracy_data, columns=['model', 'avg_accuracy', 'avg_accuracy_formatted'])
-            model_avg = model_avg.merge(accuracy_df, on='model', how='left')
+        # Show each interval as one [low, high] column
+        display_avg = model_avg.copy()
+        for name, fmt in CONFIDENCE_INTERVAL_FORMATS.items():
+            if f'{name}_low' in display_avg.columns:
+                display_avg[name] = [
+                    'N/A' if pd.isna(low) else f"[{fmt.format(low)}, {fmt.format(high)}]"
+                    for low, high in zip(display_avg[f'{name}_low'], display_avg[f'{name}_high'])
+                ]
+                display_avg = display_avg.drop(columns=[f'{name}_low', f'{name}_high'])
+    
+    for column in ('cache_hit_rate', 'cached_token_rate'):
+        display_avg[column] = display_avg[column].map(lambda x: 'N/A' if pd.isna(x) else f"{x:.2%}")
     
     # Display the model averages
-    print(tabulate(model_avg, headers='keys', tablefmt='grid', showindex=False))
+    print(tabulate(display_avg, headers='keys', tablefmt='grid', showindex=False))
     
     # Save results as JSON if requested
     if json_output:
-        save_results_as_json(df, model_avg, json_output)
+        save_results_as_json(df.drop(columns=['latency_histogram', 'path']), model_avg, json_output)
 
 def main():
     from datetime import datetime
@@ -180,10 +525,21 @@ def main():
     parser.add_argument('--directory', default='outputs', help='Directory containing LLM result JSON files')
     parser.add_argument('--json', default=os.path.join('outputs', 'summary.json'), 
                         help='Output file path for JSON results (default: outputs/summary.json)')
+    parser.add_argument('--no-print', action='store_true', help='Only print the summary tables, not progress messages')
+    parser.add_argument('--index', help=f'SQLite results index to reuse between runs (default: {INDEX_FILE_NAME} in --directory)')
+    parser.add_argument('--no-index', action='store_true', help='Parse every report instead of using the results index')
+    parser.add_argument('--rebuild-index', action='store_true', help='Discard the results index and parse every report again')
+    parser.add_argument('--workers', type=int, help='Processes used to parse reports (default: one per core)')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='Add bootstrap confidence intervals from N resamples of the question ids (e.g. 1000)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the bootstrap intervals (default: 0.95)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the bootstrap resamples (default: 0)')
     
     args = parser.parse_args()
     
-    summarize_results(args.directory, args.json, not args.no_print)
+    summarize_results(args.directory, args.json, not args.no_print,
+                      index_path=False if args.no_index else args.index, rebuild_index=args.rebuild_index,
+                      workers=args.workers, bootstrap=args.bootstrap, confidence=args.confidence, seed=args.seed)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file